@@ -0,0 +1,160 @@
+"""
+Event dispatch throughput: main.handle_event's table lookup against the
+previous if/elif chain, over a mixed stream of internal events, with overlay,
+camera and kill stubbed as in bench.replay.
+
+    python -m bench.bench_dispatch --events 50000
+"""
+
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import logging
+import datetime
+
+from bench.replay import load_client
+
+EVENT_MIX = [
+    ('server', 'client', 'connected', {'client': {'name': 'pc-1'}}),
+    ('server', 'client', 'disconnected', {'client': {'name': 'pc-1'}}),
+    ('tapo_c100', 'onvif', 'motion', {}),
+    ('self', 'connection', 'disconnected', {}),
+    ('self', 'client', 'zero_client', {}),
+    ('ha', 'user', 'ignore', {}),
+    ('ha', 'user', 'arm', {}),
+    ('ha', 'sensor', 'battery_low', {}), # no rule: dropped
+]
+
+
+def legacy_handler(main):
+    '''Previous handle_event for internal events: Event construction, then the if/elif chain'''
+    states, warn, kill, log = main.states, main.warn, main.kill, main.log
+
+    async def dispatch(event):
+        event_obj = main.Event(is_internal=True, id=event['id'], event=event['event'], type=event['type'],
+                               source=event['source'], timestamp=event['timestamp'], data=event.get('data', {}))
+
+        if event_obj.type == 'client' and event_obj.source == 'server':
+            await states.push_event(event_obj)
+            log.info(f'[CLIENT] Client \'{event_obj.data["client"]["name"]}\' {event_obj.event}')
+
+        elif event_obj.event == 'zero_client' and event_obj.source == 'self' and not await states.is_previous_event_valid(event_obj.type, event_obj.event):
+            await states.push_event(event_obj)
+            log.warning(f'[CLIENT] Zero client detected: PC: {len(states.client_list_pc)}, HA: {len(states.client_list_ha)}, HTML: {len(states.client_list_html)}')
+            warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', 'ZERO CLIENT', f'PC: {len(states.client_list_pc)}, HA: {len(states.client_list_ha)}, HTML: {len(states.client_list_html)}', no_audio=True)
+
+        elif event_obj.type == 'connection' and not await states.is_previous_event_valid(event_obj.type, event_obj.event):
+            await states.push_event(event_obj)
+            log.warning(f'[CONNECTION] Server {event_obj.event}.')
+            warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', event_obj.event.upper(), 'SERVER DISCONNECTED', no_audio=True)
+
+        elif event_obj.type == 'onvif' and not await states.is_previous_event_valid(event_obj.type):
+            await states.push_event(event_obj)
+            log.warning(f'[ONVIF] {event_obj.event.upper()} detected.')
+            warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', 'MOTION DETECTED', 'Loading...', is_priority=True)
+            await main.get_camera_frames(event_obj)
+
+        elif event_obj.type == 'user':
+            await states.push_event(event_obj)
+            if event_obj.event == 'kill':
+                log.warning(f'[USER] {event_obj.event.upper()} Initiated. (Kill mode: {event_obj.data.get("killMode", "unknown")})')
+                kill_mode = event_obj.data.get('killMode', 'unknown')
+                warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', 'KILLING', f'KILLING...\n(mode: {kill_mode})', no_audio=True, is_priority=True)
+                await kill.kill(kill_mode)
+            elif event_obj.event == 'ignore':
+                log.info(f'[USER] {event_obj.event.upper()} Initiated.')
+                warn.stop('_force_stop_all')
+
+    return dispatch
+
+
+def table_handler(main):
+    return lambda event: main.handle_event(event, True)
+
+
+def scan_rules(rules, source: str, type: str, event: str):
+    '''First-match linear scan, the obvious alternative for config-driven rules'''
+    for rule in rules:
+        rule_source, rule_type, rule_event = rule.key
+        if (rule_source in ('*', source)) and (rule_type in ('*', type)) and (rule_event in ('*', event)):
+            return rule
+    return None
+
+
+def bench_rule_count(keys, rule_count: int):
+    from utils.dispatch import DEFAULT_RULES, DispatchTable
+    # Site rules go first so they win over the wildcard defaults in the scan too
+    extra = [{'source': '*', 'type': f'custom{index}', 'event': '*'} for index in range(rule_count)]
+    table = DispatchTable(extra + DEFAULT_RULES)
+    rules = list(table._rules.values())
+
+    start = time.perf_counter()
+    for key in keys:
+        table.lookup(*key)
+    lookup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        scan_rules(rules, *key)
+    scan_time = time.perf_counter() - start
+    return lookup_time / len(keys), scan_time / len(keys)
+
+
+def make_events(count: int, seed: int):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        source, type, event, data = rng.choice(EVENT_MIX)
+        events.append({'id': str(uuid.uuid4()), 'event': event, 'type': type, 'source': source,
+                       'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(), 'data': data})
+    return events
+
+
+async def bench(main, dispatch, events, history: int):
+    main.states.event_list.clear()
+    start = time.perf_counter()
+    for event in events:
+        await dispatch(event)
+        if len(main.states.event_list) > history:
+            # Keep the event list at a steady size, as clear_old_events would
+            del main.states.event_list[:len(main.states.event_list) - history]
+    return time.perf_counter() - start
+
+
+async def run(args):
+    main, stats, create_link = load_client()
+    events = make_events(args.events, args.seed)
+
+    keys = [(event['source'], event['type'], event['event']) for event in events]
+
+    results = {}
+    for name, dispatch in (('if/elif chain', legacy_handler(main)), ('dispatch table', table_handler(main))):
+        await bench(main, dispatch, events[:1000], args.history) # warm up
+        results[name] = await bench(main, dispatch, events, args.history)
+
+    print(f'{args.events} events, {len(EVENT_MIX)} kinds, {args.history} events of history')
+    for name, elapsed in results.items():
+        print(f'{name:>15}: {elapsed / args.events * 1e6:7.2f}us/event  {args.events / elapsed:10.0f} events/s')
+
+    print(f'{"rules":>7} {"lookup ns":>10} {"scan ns":>10}')
+    for rule_count in (0, 10, 100, 1000):
+        lookup_time, scan_time = bench_rule_count(keys, rule_count)
+        print(f'{rule_count + len(main.dispatch_table._rules):7d} {lookup_time * 1e9:10.0f} {scan_time * 1e9:10.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Event dispatch throughput benchmark')
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--history', type=int, default=50, help='events kept in states.event_list')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Records are still built and handled, just not written anywhere
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Frame change detector cost against the overlay work it saves: per-frame CPU
+of FrameChangeDetector.check(), and per-frame cost of what a dropped frame
+skips (queue hand-off to the overlay process, full decode, scale and
+repaint), over synthetic camera sequences.
+
+    QT_QPA_PLATFORM=offscreen python -m bench.bench_frames --frames 200
+"""
+
+import os
+import time
+import argparse
+from multiprocessing import Queue
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QBuffer, QIODevice
+from PySide6.QtGui import QImage, QPixmap
+
+from warn.change import FrameChangeDetector
+from warn.overlay import OverlayWindow
+
+
+def encode_jpeg(pixels: np.ndarray, quality: int = 80) -> bytes:
+    height, width, _ = pixels.shape
+    image = QImage(pixels.data, width, height, width * 3, QImage.Format.Format_RGB888)
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, 'JPEG', quality)
+    return bytes(buffer.data())
+
+
+def make_scene(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    scene = np.stack([(x * 255 // width), (y * 255 // height), ((x + y) * 127 // (width + height))], axis=-1)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, width - 100), rng.integers(0, height - 100)
+        scene[y0:y0 + rng.integers(20, 100), x0:x0 + rng.integers(20, 100)] = rng.integers(0, 255, 3)
+    return scene.astype(np.uint8)
+
+
+def make_sequences(frames: int, width: int, height: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    scene = make_scene(width, height, rng)
+
+    still = encode_jpeg(scene)
+    noisy = []
+    moving = []
+    for index in range(frames):
+        # Sensor noise and re-encoding: new bytes, same picture
+        noise = rng.normal(0, 3, scene.shape)
+        noisy.append(encode_jpeg(np.clip(scene + noise, 0, 255).astype(np.uint8)))
+
+        # A person-sized block crossing the view
+        frame = np.clip(scene + noise, 0, 255).astype(np.uint8)
+        x0 = int((index * 23) % (width - 120))
+        frame[height // 3:height // 3 + 240, x0:x0 + 120] = (200, 180, 160)
+        moving.append(encode_jpeg(frame))
+
+    return {
+        'identical bytes': [still] * frames,
+        'static + noise': noisy,
+        'moving object': moving,
+    }
+
+
+def bench_detector(frames: list) -> tuple:
+    detector = FrameChangeDetector()
+    detector.is_enabled = True
+    start = time.process_time()
+    scores = [detector.check('camera', image_bytes)[1] for image_bytes in frames]
+    elapsed = time.process_time() - start
+    scores = [score for score in scores if score is not None]
+    return elapsed / len(frames), detector.dropped, max(scores) if scores else 0
+
+
+def bench_overlay_update(window: OverlayWindow, frames: list, count: int) -> float:
+    '''What a shown frame costs: queue round trip, tile decode + scale, repaint'''
+    queue = Queue()
+    target = QPixmap(window.size())
+    start = time.process_time()
+    for index, image_bytes in enumerate(frames):
+        queue.put(('tile', (index % count, count, image_bytes)))
+        kind, payload = queue.get()
+        window.update_tile(*payload)
+        window.render(target)
+    return (time.process_time() - start) / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame change detection benchmark')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--cameras', type=int, default=4, help='tiles in the overlay grid')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    app = QApplication()
+    sequences = make_sequences(args.frames, args.width, args.height, args.seed)
+    window = OverlayWindow('MOTION DETECTED', None)
+    overlay_cost = bench_overlay_update(window, sequences['static + noise'], args.cameras)
+
+    print(f'{args.frames} frames per sequence, {args.width}x{args.height} JPEG, {args.cameras} tiles')
+    print(f'overlay update (queue + decode + scale + repaint): {overlay_cost * 1000:.2f}ms CPU/frame')
+    print(f'{"sequence":>16} {"detect ms":>10} {"dropped":>8} {"max score":>10} {"saved ms/frame":>15}')
+    for name, frames in sequences.items():
+        detect_cost, dropped, max_score = bench_detector(frames)
+        saved = dropped / len(frames) * overlay_cost - detect_cost
+        print(f'{name:>16} {detect_cost * 1000:10.3f} {dropped:8d} {max_score:9.1f}% {saved * 1000:15.2f}')
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
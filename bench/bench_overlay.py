@@ -0,0 +1,87 @@
+"""
+Offscreen paint benchmark for the overlay window: per-repaint cost of the
+cached-frame paintEvent against the previous draw-everything paintEvent.
+
+    QT_QPA_PLATFORM=offscreen python -m bench.bench_overlay --repaints 2000
+"""
+
+import os
+import time
+import argparse
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, QRect
+from PySide6.QtGui import QPainter, QColor, QFont, QPixmap
+
+from utils.config import config
+from warn.overlay import OverlayWindow
+
+
+class LegacyOverlayWindow(OverlayWindow):
+    '''Previous implementation: new fonts and a full redraw on every paint'''
+    def _create_dummy_image(self):
+        dummy_image = QPixmap(1280, 720)
+        dummy_image.fill(QColor(255, 30, 30))
+        self.image = dummy_image.scaled(
+            config.window_width, config.window_height,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if not self.image.isNull():
+            painter.drawPixmap(0, 0, self.image)
+        if self.overlay_message:
+            painter.setPen(config.font_message_color)
+            painter.setFont(QFont(config.font_family, config.font_message_size, QFont.Weight.Bold))
+            painter.drawText(QRect(0, 0, config.window_width, self.image.height()), Qt.AlignmentFlag.AlignCenter, self.overlay_message)
+        background_rect_y = self.image.height()
+        background_rect_height = self.height() - self.image.height()
+        painter.fillRect(QRect(0, background_rect_y, self.width(), background_rect_height), config.background_color)
+        painter.setPen(config.font_title_color)
+        painter.setFont(QFont(config.font_family, config.font_title_size, QFont.Weight.Bold))
+        painter.drawText(QRect(0, background_rect_y, self.width(), background_rect_height - 5),
+                         Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom, self.overlay_title)
+        painter.end()
+
+
+def bench(window_class, repaints: int, changes_every: int):
+    start = time.perf_counter()
+    window = window_class('MOTION DETECTED', 'Loading...')
+    created = time.perf_counter() - start
+    target = QPixmap(window.size())
+
+    # render() runs paintEvent synchronously, like an expose/repaint would
+    start = time.perf_counter()
+    for i in range(repaints):
+        if changes_every and i % changes_every == 0:
+            window.update_title(f'MOTION DETECTED x{i // changes_every + 1}')
+        window.render(target)
+    elapsed = time.perf_counter() - start
+    return window, created * 1e3, elapsed / repaints * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repaints', type=int, default=2000)
+    parser.add_argument('--changes-every', type=int, default=50, help='title change every N repaints (0: never)')
+    args = parser.parse_args()
+
+    app = QApplication()
+    windows = []
+    for name, window_class in (('legacy', LegacyOverlayWindow), ('cached', OverlayWindow)):
+        window, created, per_repaint = bench(window_class, args.repaints, args.changes_every)
+        windows.append(window)
+        print(f'{name:>6}: window created in {created:6.2f}ms, {per_repaint:7.2f} us/repaint')
+
+    for window in windows:
+        window.deleteLater()
+    app.processEvents()
+
+
+if __name__ == '__main__':
+    main()
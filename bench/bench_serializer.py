@@ -0,0 +1,55 @@
+"""
+Encode/decode cost and frame size of the socket.io packet serializers, using
+realistic 'get_result' payloads from the stub server.
+
+    python -m bench.bench_serializer --clients 30 --events 5
+"""
+
+import uuid
+import timeit
+import argparse
+import datetime
+
+from socketio import packet, msgpack_packet
+
+from bench.stub_server import StubState
+
+
+def build_payload(clients: int, events: int) -> dict:
+    state = StubState(clients)
+    for i in range(events):
+        state.push_event({
+            'id': str(uuid.uuid4()),
+            'event': 'motion',
+            'type': 'onvif',
+            'source': f'camera_{i}',
+            'timestamp': datetime.datetime.now().isoformat(),
+            'data': {'topic': 'tns1:RuleEngine/CellMotionDetector/Motion', 'isMotion': True},
+        })
+    return state.snapshot()
+
+
+def bench(packet_class, payload: dict, number: int):
+    pkt = packet_class(packet.EVENT, data=['get_result', payload])
+    encoded = pkt.encode()
+
+    encode_time = timeit.timeit(lambda: packet_class(packet.EVENT, data=['get_result', payload]).encode(), number=number)
+    decode_time = timeit.timeit(lambda: packet_class(encoded_packet=encoded), number=number)
+    return len(encoded), encode_time / number * 1e6, decode_time / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=30)
+    parser.add_argument('--events', type=int, default=5)
+    parser.add_argument('--number', type=int, default=5000)
+    args = parser.parse_args()
+
+    payload = build_payload(args.clients, args.events)
+    for name, packet_class in (('json', packet.Packet), ('msgpack', msgpack_packet.MsgPackPacket)):
+        size, encode, decode = bench(packet_class, payload, args.number)
+        print(f'{name:>7}: {size:6d} bytes, encode {encode:7.2f} us, decode {decode:7.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares full snapshot and delta 'get_result' heartbeats: payload size on the
+wire and CPU time spent applying the client list on the client side.
+
+    python -m bench.bench_sync --clients 30 --heartbeats 2000
+"""
+
+import json
+import time
+import random
+import argparse
+
+from bench.stub_server import StubState
+from utils.states import States
+from objects.link import ServerLink
+
+
+def run(mode: str, clients: int, heartbeats: int, churn_every: int):
+    random.seed(0)
+    server = StubState(clients)
+    client = States()
+    link = ServerLink(0, 'bench://', None)
+
+    total_bytes = 0
+    cpu_time = 0.0
+    for i in range(heartbeats):
+        if i and i % churn_every == 0:
+            removed = server.clients[random.choice(list(server.clients))]
+            server.remove_client(removed['id'])
+            server.upsert_client(dict(removed, id=f'{removed["id"]}-{i}'))
+
+        if mode == 'delta' and link.sync_version is not None:
+            payload = server.delta(link.sync_version)
+        else:
+            payload = server.snapshot()
+
+        raw = json.dumps(payload, separators=(',', ':'))
+        total_bytes += len(raw)
+
+        start = time.process_time()
+        data = json.loads(raw)
+        is_delta = data.get('isDelta', False) and link.sync_version is not None
+        client.apply_client_list(link.client_map, data.get('clientList', []), data.get('removedClients', []), is_delta)
+        link.sync_version = data.get('version', None)
+        client.merge_links([link])
+        cpu_time += time.process_time() - start
+
+    assert len(link.client_map) == len(server.clients)
+    return total_bytes / heartbeats, cpu_time / heartbeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=30)
+    parser.add_argument('--heartbeats', type=int, default=2000)
+    parser.add_argument('--churn-every', type=int, default=20)
+    args = parser.parse_args()
+
+    for mode in ('full', 'delta'):
+        size, cpu = run(mode, args.clients, args.heartbeats, args.churn_every)
+        print(f'{mode:>5}: {size:8.1f} bytes/heartbeat, {cpu:7.2f} us CPU/heartbeat')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Replays a traffic capture (see `captureFile` in config) through the real
+handlers in main.py, with socket.io, camera, Qt, audio and kill stubbed.
+
+    python -m bench.replay capture-20260101-120000-4242.jsonl --speed 1
+    python -m bench.replay capture-20260101-120000-4242.jsonl --speed 0 --profile replay.prof
+
+--speed 1 replays in real time, N replays N times faster, 0 as fast as possible.
+"""
+
+import sys
+import time
+import types
+import asyncio
+import cProfile
+import logging
+import argparse
+import statistics
+
+log = logging.getLogger('replay')
+
+
+def install_stubs():
+    # Qt and audio only ever run inside child processes. Replacing their modules
+    # keeps PySide6 and winmm out of the replay entirely.
+    overlay = types.ModuleType('warn.overlay')
+    overlay.run_qt = lambda *args, **kwargs: None
+    sound = types.ModuleType('warn.sound')
+    sound.run_audio = lambda *args, **kwargs: None
+    sys.modules['warn.overlay'] = overlay
+    sys.modules['warn.sound'] = sound
+
+
+def load_client():
+    install_stubs()
+    import main
+
+    stats = {'emits': 0, 'warn_starts': 0, 'kills': 0}
+
+    async def emit(event, data=None, **kwargs):
+        stats['emits'] += 1
+
+    async def get_camera_frames(event_obj, warn_key=None, is_refresh=False):
+        return None
+
+    async def kill(kill_mode):
+        stats['kills'] += 1
+
+    def no_op(*args, **kwargs):
+        pass
+
+    def start_qt(*args, **kwargs):
+        stats['warn_starts'] += 1
+
+    def create_link(index):
+        link = main.create_link(index, f'replay://{index}')
+        link.sio.emit = emit
+        link.sio.connected = True
+        main.links.append(link)
+        return link
+
+    main.links.clear()
+    main.get_camera_frames = get_camera_frames
+    main.kill.kill = kill
+    main.warn._start_qt = start_qt
+    main.warn._stop_qt = no_op
+    main.warn._start_audio = no_op
+    main.warn._stop_audio = no_op
+    main.warn.update_image = no_op
+    main.warn.update_tile = no_op
+    main.warn.update_title = no_op
+
+    return main, stats, create_link
+
+
+async def replay(path: str, speed: float, run_workers: bool):
+    from utils.capture import read_capture
+
+    main, stats, create_link = load_client()
+    handlers = {
+        'connect': lambda link, data: main.on_connect(link),
+        'disconnect': lambda link, data: main.on_disconnect(link),
+        'event': main.on_event,
+        'ping': main.on_ping,
+        'get_result': main.on_get_result,
+    }
+    links = {}
+
+    workers = []
+    if run_workers:
+        workers.append(asyncio.create_task(main.states.clear_old_events_worker()))
+        workers.append(asyncio.create_task(main.connection_monitoring_worker()))
+
+    timings = {}
+    started_at = time.monotonic()
+    lag = []
+    for offset, name, data, link_index in read_capture(path):
+        if speed > 0:
+            delay = started_at + offset / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lag.append(-delay)
+
+        handler = handlers.get(name)
+        if handler is None:
+            log.warning(f'Unknown message \'{name}\' in capture. Skipping...')
+            continue
+
+        link = links.get(link_index)
+        if link is None:
+            link = links[link_index] = create_link(link_index)
+
+        handler_start = time.perf_counter()
+        await handler(link, data if data is not None else {})
+        timings.setdefault(name, []).append(time.perf_counter() - handler_start)
+
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    elapsed = time.monotonic() - started_at
+    return timings, stats, elapsed, lag
+
+
+def report(timings: dict, stats: dict, elapsed: float, lag: list):
+    total = sum(len(samples) for samples in timings.values())
+    print(f'Replayed {total} messages in {elapsed:.3f}s')
+    print(f'{"message":>12} {"count":>7} {"mean ms":>9} {"p50 ms":>9} {"p99 ms":>9} {"max ms":>9}')
+    for name, samples in sorted(timings.items()):
+        samples = sorted(samples)
+        p99 = samples[min(len(samples) - 1, int(len(samples) * .99))]
+        print(f'{name:>12} {len(samples):7d} {statistics.mean(samples) * 1000:9.3f} '
+              f'{statistics.median(samples) * 1000:9.3f} {p99 * 1000:9.3f} {samples[-1] * 1000:9.3f}')
+    print(f'emits: {stats["emits"]}, overlays started: {stats["warn_starts"]}, kills: {stats["kills"]}')
+    if lag:
+        print(f'behind schedule: {len(lag)} messages, max {max(lag) * 1000:.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a client traffic capture')
+    parser.add_argument('capture')
+    parser.add_argument('--speed', type=float, default=1, help='1 = real time, N = N times faster, 0 = max')
+    parser.add_argument('--workers', action='store_true', help='also run the connection monitor and event cleaner')
+    parser.add_argument('--profile', help='write a cProfile dump of the replay to this path')
+    parser.add_argument('--uvloop', action='store_true', help='run the replay on uvloop (Linux/macOS, pip install uvloop)')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.uvloop:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    result = asyncio.run(replay(args.capture, args.speed, args.workers))
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    report(*result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Minimal local ICE server stub for benchmarking the client.
+
+Pings every connected client on an interval, answers 'get' with either a full
+snapshot or a versioned delta, and reports the average 'get_result' size.
+
+    python -m bench.stub_server --port 8080 --clients 30 --mode delta
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+import datetime
+
+import socketio
+from aiohttp import web
+
+log = logging.getLogger('stub_server')
+
+
+class StubState:
+    def __init__(self, client_count: int, changelog_size: int = 1000):
+        self.version = 0
+        self.clients = {}
+        self.events = []
+        self.changelog = [] # (version, kind, key)
+        self.changelog_size = changelog_size
+        self.is_armed = True
+
+        for i in range(client_count):
+            self.upsert_client({
+                'id': str(uuid.uuid4()),
+                'name': f'client-{i}',
+                'type': ('pc', 'ha', 'html')[i % 3],
+                'connectedAt': datetime.datetime.now().isoformat(),
+            })
+
+    def _bump(self, kind: str, key: str):
+        self.version += 1
+        self.changelog.append((self.version, kind, key))
+        if len(self.changelog) > self.changelog_size:
+            self.changelog.pop(0)
+
+    def upsert_client(self, client: dict):
+        self.clients[client['id']] = client
+        self._bump('client', client['id'])
+
+    def remove_client(self, client_id: str):
+        self.clients.pop(client_id, None)
+        self._bump('removed', client_id)
+
+    def push_event(self, event: dict):
+        self.events.append(event)
+        self._bump('event', event['id'])
+
+    def ack(self, event_id: str):
+        self.events = [event for event in self.events if event['id'] != event_id]
+
+    def snapshot(self) -> dict:
+        return {
+            'version': self.version,
+            'isDelta': False,
+            'isArmed': self.is_armed,
+            'eventList': list(self.events),
+            'clientList': list(self.clients.values()),
+        }
+
+    def delta(self, since: int) -> dict:
+        if not self.changelog or since < self.changelog[0][0] - 1:
+            return self.snapshot()
+
+        changed_clients = set()
+        removed_clients = set()
+        new_events = set()
+        for version, kind, key in self.changelog:
+            if version <= since:
+                continue
+            if kind == 'client':
+                changed_clients.add(key)
+                removed_clients.discard(key)
+            elif kind == 'removed':
+                removed_clients.add(key)
+                changed_clients.discard(key)
+            elif kind == 'event':
+                new_events.add(key)
+
+        return {
+            'version': self.version,
+            'isDelta': True,
+            'isArmed': self.is_armed,
+            'eventList': [event for event in self.events if event['id'] in new_events],
+            'clientList': [self.clients[key] for key in changed_clients if key in self.clients],
+            'removedClients': list(removed_clients),
+        }
+
+
+def create_app(args) -> web.Application:
+    sio = socketio.AsyncServer(async_mode='aiohttp', serializer='msgpack' if args.serializer == 'msgpack' else 'default')
+    app = web.Application()
+    sio.attach(app)
+
+    state = StubState(args.clients)
+    stats = {'count': 0, 'bytes': 0}
+
+    @sio.event
+    async def connect(sid, environ):
+        if args.handshake_delay > 0:
+            # The CONNECT answer goes out once this handler returns
+            await asyncio.sleep(args.handshake_delay)
+        log.info(f'Client connected: {sid}')
+
+    @sio.on('introduce')
+    async def on_introduce(sid, data):
+        log.info(f'Introduced: {data}')
+
+    @sio.on('get')
+    async def on_get(sid, data=None):
+        if args.mode == 'delta' and data and data.get('since') is not None:
+            payload = state.delta(data['since'])
+        else:
+            payload = state.snapshot()
+            if args.mode == 'full':
+                payload.pop('version')
+                payload.pop('isDelta')
+        payload['serverTime'] = int(time.time() * 1000)
+        stats['count'] += 1
+        stats['bytes'] += len(json.dumps(payload, separators=(',', ':')))
+        await sio.emit('get_result', payload, to=sid)
+
+    @sio.on('ack')
+    async def on_ack(sid, data):
+        state.ack(data['id'])
+
+    async def ping_worker():
+        while True:
+            await sio.emit('ping')
+            await asyncio.sleep(args.ping_interval)
+
+    async def churn_worker():
+        while True:
+            await asyncio.sleep(args.churn_interval)
+            if random.random() < 0.5 and state.clients:
+                state.remove_client(random.choice(list(state.clients)))
+            else:
+                state.upsert_client({
+                    'id': str(uuid.uuid4()),
+                    'name': f'client-{state.version}',
+                    'type': random.choice(('pc', 'ha', 'html')),
+                    'connectedAt': datetime.datetime.now().isoformat(),
+                })
+
+    async def event_worker():
+        # Deterministic IDs: several stubs started together emit the same events,
+        # like redundant endpoints of one ICE server would.
+        count = 0
+        while True:
+            await asyncio.sleep(args.event_interval)
+            count += 1
+            event = {
+                'id': f'stub-event-{count}',
+                'event': 'motion',
+                'type': 'onvif',
+                'source': 'stub',
+                'timestamp': datetime.datetime.now().isoformat(),
+            }
+            state.push_event(event)
+            await asyncio.sleep(args.event_delay)
+            await sio.emit('event', {'event': event})
+
+    async def stats_worker():
+        while True:
+            await asyncio.sleep(args.report_interval)
+            if stats['count']:
+                log.info(f'get_result: {stats["count"]} heartbeats, {stats["bytes"] / stats["count"]:.1f} bytes/heartbeat')
+            stats['count'] = 0
+            stats['bytes'] = 0
+
+    async def on_startup(app):
+        app['workers'] = [
+            asyncio.create_task(ping_worker()),
+            asyncio.create_task(churn_worker()),
+            asyncio.create_task(stats_worker()),
+        ]
+        if args.event_interval > 0:
+            app['workers'].append(asyncio.create_task(event_worker()))
+
+    app.on_startup.append(on_startup)
+    app['sio'] = sio
+    app['state'] = state
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local ICE server stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--clients', type=int, default=30)
+    parser.add_argument('--mode', choices=('full', 'delta'), default='delta')
+    parser.add_argument('--serializer', choices=('json', 'msgpack'), default='json')
+    parser.add_argument('--ping-interval', type=float, default=0.5)
+    parser.add_argument('--churn-interval', type=float, default=5)
+    parser.add_argument('--event-interval', type=float, default=0, help='emit an ONVIF event every N seconds (0: never)')
+    parser.add_argument('--event-delay', type=float, default=0, help='delay before emitting each event')
+    parser.add_argument('--handshake-delay', type=float, default=0, help='delay before answering the socket.io handshake')
+    parser.add_argument('--report-interval', type=float, default=10)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        format='%(asctime)s [%(levelname)s] %(name)s - %(message)s',
+        level=logging.INFO,
+        datefmt='%Y-%m-%d %H:%M:%S',
+    )
+    args = parse_args()
+    web.run_app(create_app(args), host=args.host, port=args.port)
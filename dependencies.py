@@ -7,6 +7,8 @@ def is_venv():
 def is_dependencies_installed():
     try:
         import aiohttp
+        import msgpack
+        import numpy
         import obsws_python
         import psutil
         import PySide6
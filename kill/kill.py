@@ -5,6 +5,7 @@ from typing import Tuple, TYPE_CHECKING
 
 from utils.config import config
 from kill.obs import start_obs_worker
+from utils.logger import get_log_queue
 
 if TYPE_CHECKING:
     from warn.warn import WarnSession
@@ -21,10 +22,16 @@ class Killer:
         self.obs_worker = None
 
     def start_worker(self):
-        self.obs_worker = Process(target=start_obs_worker, args=(self.obs_queue, ))
+        self.obs_worker = Process(target=start_obs_worker, args=(self.obs_queue, get_log_queue()))
         self.obs_worker.daemon = False
         self.obs_worker.start()
 
+    def stop_worker(self):
+        if self.obs_worker is not None:
+            self.obs_worker.kill()
+            self.obs_worker.join(timeout=.1)
+            self.obs_worker = None
+
     async def kill(self, kill_mode: str):
         kill_config = config.kill_config.get(kill_mode, None)
 
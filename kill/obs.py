@@ -7,6 +7,7 @@ import obsws_python as obs
 import psutil
 
 from utils.config import config
+from utils.logger import setup_logging
 
 log = logging.getLogger(__name__)
 
@@ -91,7 +92,8 @@ async def obs_kill_worker(obs: OBSWrapper, queue: Queue):
             log.error(f'Unknown error: {e}')
             await asyncio.sleep(.1)
 
-def start_obs_worker(queue: Queue):
+def start_obs_worker(queue: Queue, log_queue: Queue):
+    setup_logging(log_queue)
     asyncio.run(start_obs_worker_async(queue))
 
 async def start_obs_worker_async(queue: Queue):
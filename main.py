@@ -1,29 +1,40 @@
 import logging
-
-logging.basicConfig(
-    format='%(asctime)s [%(levelname)s] %(name)s - %(message)s',
-    level=logging.INFO,
-    datefmt='%Y-%m-%d %H:%M:%S',
-)
-
 import sys
 import ctypes
+import time
 import datetime
 import asyncio
 import uuid
+import functools
+import urllib.parse
 
 import socketio
 import aiohttp
 
 from utils.config import config
 from utils.states import states
+from utils.logger import setup_logging, stop_logging
+from utils.capture import capture
+from utils.archive import archive
+from utils.profiler import profiler
+from utils.dispatch import dispatch_table, get_template_context, render
 from objects.event import Event
+from objects.link import ServerLink
 from warn.warn import WarnSession
 from kill.kill import Killer
 
 log = logging.getLogger('main')
 
-sio = socketio.AsyncClient()
+def get_serializer():
+    if config.serializer == 'msgpack':
+        try:
+            import msgpack
+        except ImportError:
+            log.critical('Serializer \'msgpack\' is configured but the msgpack package is not installed.')
+            sys.exit(1)
+        return 'msgpack'
+    return 'default'
+
 warn = WarnSession()
 kill = Killer(warn)
 
@@ -35,10 +46,76 @@ def is_admin_windows():
     except Exception as e:
         return False
 
-async def handle_event(event, is_internal):
+async def get_camera_frame(session: aiohttp.ClientSession, camera: dict):
+    image_bytes = None
+    try:
+        async with session.get(camera['url'], timeout=aiohttp.ClientTimeout(total=config.camera_timeout)) as response:
+            response.raise_for_status()
+            image_bytes = await response.read()
+    except asyncio.TimeoutError:
+        log.error(f'Timed out getting camera frame from \'{camera.get("name")}\'')
+    except aiohttp.ClientError as e:
+        log.error(f'Error getting camera frame from \'{camera.get("name")}\': {e}')
+    except Exception as e:
+        log.error(f'An unexpected error occurred: {e}')
+    return image_bytes
+
+async def get_camera_frames(event_obj: Event, warn_key: str, is_refresh: bool = False):
+    '''
+    Fetches every camera relevant to the event concurrently. Each frame is archived
+    (refreshes are not), and handed to the overlay as it arrives if the overlay
+    still shows this event and the frame changed since the last one it got.
+    '''
+    cameras = config.get_cameras(event_obj.source)
+    semaphore = asyncio.Semaphore(config.camera_concurrency)
+
+    async def fetch(index: int, camera: dict):
+        async with semaphore:
+            image_bytes = await get_camera_frame(session, camera)
+        if image_bytes is None:
+            return
+        camera_name = camera.get('name', str(index))
+        if not is_refresh:
+            archive.save_frame(event_obj, camera_name, image_bytes)
+        if not warn.is_showing(warn_key):
+            return
+        if warn.frames.is_enabled:
+            # Thumbnail decode releases the GIL, keep it off the loop
+            is_changed, _ = await asyncio.to_thread(warn.frames.check, camera_name, image_bytes)
+            if not is_changed:
+                return
+        warn.update_tile(index, len(cameras), image_bytes)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(fetch(index, camera) for index, camera in enumerate(cameras)))
+
+async def refresh_camera_frames(event_obj: Event, warn_key: str):
+    '''Refetches the event's cameras for as long as its overlay stays up'''
+    try:
+        while True:
+            await asyncio.sleep(config.camera_refresh_interval)
+            if not warn.is_showing(warn_key):
+                return
+            await get_camera_frames(event_obj, warn_key, is_refresh=True)
+    finally:
+        frame_refresh_tasks.pop(warn_key, None)
+
+frame_refresh_tasks = {} # warn key -> refresh_camera_frames task
+
+async def broadcast(event: str, data = None):
+    '''Emits to every connected server link'''
+    await asyncio.gather(*(link.sio.emit(event, data) for link in links if link.sio.connected), return_exceptions=True)
+
+async def handle_event(event, is_internal, link: ServerLink = None):
     if not is_internal:
+        if not await states.mark_event_seen(event['id']):
+            # Later copy of an event already handled via another server link
+            log.debug(f'Dropping duplicate event {event["id"]} from {link.url if link else "unknown"}')
+            if link is not None and link.sio.connected:
+                await link.sio.emit('ack', {'id': event['id']})
+            return
         states.last_event_id = event['id']
-        await sio.emit('ack', {'id': event['id']})
+        await broadcast('ack', {'id': event['id']})
 
     event_obj = Event(is_internal=is_internal,
                       id=event['id'],
@@ -48,67 +125,77 @@ async def handle_event(event, is_internal):
                       timestamp=event['timestamp'],
                       data=event.get('data', {}))
 
-    async def get_camera_frame():
-        image_bytes = None
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(config.camera_frame_url) as response:
-                    response.raise_for_status()
-                    image_bytes = await response.read()
-        except aiohttp.ClientError as e:
-            log.error(f'Error getting camera frame: {e}')
-        except Exception as e:
-            log.error(f'An unexpected error occurred: {e}')
-        return image_bytes
-
-    if event_obj.type == 'client' and event_obj.source == 'server':
-        await states.push_event(event_obj)
-        log.info(f'[CLIENT] Client \'{event_obj.data['client']['name']}\' {event_obj.event}')
-
-    elif event_obj.event == 'zero_client' and event_obj.source == 'self' and not await states.is_previous_event_valid(event_obj.type, event_obj.event):
-        await states.push_event(event_obj)
-        log.warning(f'[CLIENT] Zero client detected: PC: {len(states.client_list_pc)}, HA: {len(states.client_list_ha)}, HTML: {len(states.client_list_html)}')
-        warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', 'ZERO CLIENT', f'PC: {len(states.client_list_pc)}, HA: {len(states.client_list_ha)}, HTML: {len(states.client_list_html)}', no_audio=True)
-
-    elif event_obj.type == 'connection' and not await states.is_previous_event_valid(event_obj.type, event_obj.event):
-        await states.push_event(event_obj)
-        log.warning(f'[CONNECTION] Server {event_obj.event}.')
-        warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', event_obj.event.upper(), 'SERVER DISCONNECTED', no_audio=True)
-
-    elif event_obj.type == 'onvif' and not await states.is_previous_event_valid(event_obj.type):
-        await states.push_event(event_obj)
-        log.warning(f'[ONVIF] {event_obj.event.upper()} detected.')
-        warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', 'MOTION DETECTED', 'Loading...', is_priority=True)
-        image_bytes = await get_camera_frame()
-        warn.update_image(image_bytes)
-
-    elif event_obj.type == 'user':
-        await states.push_event(event_obj)
-
-        if event_obj.event == 'kill':
-            log.warning(f'[USER] {event_obj.event.upper()} Initiated. (Kill mode: {event_obj.data.get("killMode", "unknown")})')
-            kill_mode = event_obj.data.get('killMode', 'unknown')
-            warn.start(f'{event_obj.source}_{event_obj.type}_{event_obj.event}', 'KILLING', f'KILLING...\n(mode: {kill_mode})', no_audio=True, is_priority=True)
-            await kill.kill(kill_mode)
-        elif event_obj.event == 'ignore':
-            log.info(f'[USER] {event_obj.event.upper()} Initiated.')
+    occurred_at = link.clock.to_monotonic(event_obj.timestamp) if not is_internal and link is not None else None
+    if occurred_at is not None:
+        link.clock.record_delivery_latency(event_obj.received_at - occurred_at)
+        event_obj.monotonic_timestamp = min(occurred_at, event_obj.received_at)
+        log.debug(f'Event {event_obj.id} delivered in {(event_obj.received_at - occurred_at) * 1000:.1f}ms via {link.url}')
+
+    rule = dispatch_table.lookup(event_obj.source, event_obj.type, event_obj.event)
+    if rule is None:
+        return
+
+    warn_key = f'{event_obj.source}_{event_obj.type}_{event_obj.event}'
+    if rule.dedupe_by is not None and await states.is_previous_event_valid(event_obj.type,
+                                                                            event_obj.event if rule.dedupe_by == 'event' else None,
+                                                                            rule.dedupe_window):
+        # Deduplicated, but a repeat of the warning on screen still updates it in place
+        if 'warn' in rule.actions:
+            warn.repeat(warn_key)
+        return
+
+    await states.push_event(event_obj)
+    context = get_template_context(event_obj) if rule.is_templated else None
+    if rule.log_message is not None:
+        log.log(rule.log_level, render(rule.log_message, context))
+
+    is_shown = False
+    for action in rule.actions:
+        if action == 'warn':
+            is_shown = warn.start(warn_key,
+                                  render(rule.title, context),
+                                  render(rule.message, context),
+                                  no_audio=rule.no_audio,
+                                  is_priority=rule.priority)
+        elif action == 'fetch_frame':
+            # Frames are still worth fetching for the archive when no overlay shows them
+            if is_shown or archive.is_enabled:
+                await get_camera_frames(event_obj, warn_key)
+            if is_shown and config.camera_refresh_interval > 0 and warn_key not in frame_refresh_tasks:
+                frame_refresh_tasks[warn_key] = asyncio.create_task(refresh_camera_frames(event_obj, warn_key))
+        elif action == 'kill':
+            await kill.kill(event_obj.data.get('killMode', 'unknown'))
+        elif action == 'stop_warn':
             warn.stop('_force_stop_all')
 
-@sio.event
-async def connect():
-    log.info('Connected to server. Introducing self...')
-    states.last_heartbeat = datetime.datetime.now()
+async def on_connect(link: ServerLink):
+    capture.record('connect', link_index=link.index)
+    log.info(f'Connected to server {link.url}. Introducing self...')
+    link.last_heartbeat = time.monotonic()
+    link.sync_version = None # Always start with a full snapshot
     payload = {
         'name': config.client_name,
         'type': 'pc'
     }
     if states.last_event_id:
         payload['lastEventID'] = states.last_event_id
-    await sio.emit('introduce', payload)
-
-@sio.event
-async def disconnect():
-    log.warning('Disconnected from server.')
+    await link.sio.emit('introduce', payload)
+
+    if link.reconnect_started_at is not None:
+        elapsed = time.monotonic() - link.reconnect_started_at
+        link.reintroduce_times.append(elapsed)
+        log.info(f'Introduced to {link.url} {elapsed * 1000:.0f}ms after link loss ({link.backoff.attempt} retries)')
+        link.reconnect_started_at = None
+
+async def on_disconnect(link: ServerLink, reason = None):
+    capture.record('disconnect', link_index=link.index)
+    link.is_connected = False
+    link.connection_lost.set()
+    if any(other.is_healthy() for other in links):
+        log.warning(f'Disconnected from server {link.url}. Other links still up.')
+        return
+
+    log.warning(f'Disconnected from server {link.url}.')
     states.is_connected = False
     event_payload = {
         'id': str(uuid.uuid4()),
@@ -119,42 +206,42 @@ async def disconnect():
     }
     await handle_event(event_payload, is_internal=True)
 
-@sio.on('event')
-async def on_event(data = {}):
-    await handle_event(data['event'], is_internal=False)
+async def on_event(link: ServerLink, data = {}):
+    capture.record('event', data, link.index)
+    await handle_event(data['event'], is_internal=False, link=link)
 
-@sio.on('event_ignored')
-async def on_event_ignored(data = {}):
+async def on_event_ignored(link: ServerLink, data = {}):
     log.debug(f'Event ignored: {data}')
 
-@sio.on('ping')
-async def on_ping(data = {}):
-    states.is_connected = True
-    states.last_heartbeat = datetime.datetime.now()
-    await sio.emit('get')
-
-@sio.on('get_result')
-async def on_get_result(data = {}):
-    event_list = data.get('eventList', {})
-    client_list = data.get('clientList', {})
-
-    states.is_armed = data.get('isArmed', False)
-
-    new_client_list_pc = []
-    new_client_list_ha = []
-    new_client_list_html = []
-
-    for client in client_list:
-        if client['type'] == 'pc':
-            new_client_list_pc.append(client)
-        elif client['type'] == 'ha':
-            new_client_list_ha.append(client)
-        elif client['type'] == 'html':
-            new_client_list_html.append(client)
-
-    states.client_list_pc = new_client_list_pc
-    states.client_list_ha = new_client_list_ha
-    states.client_list_html = new_client_list_html
+async def on_ping(link: ServerLink, data = {}):
+    capture.record('ping', data, link.index)
+    link.is_connected = True
+    link.last_heartbeat = time.monotonic()
+    link.clock.start_round_trip()
+    if config.delta_sync and link.sync_version is not None:
+        await link.sio.emit('get', {'since': link.sync_version})
+    else:
+        await link.sio.emit('get')
+
+async def on_get_result(link: ServerLink, data = {}):
+    capture.record('get_result', data, link.index)
+    cpu_start = time.process_time()
+    link.clock.finish_round_trip(data.get('serverTime', None))
+    # Only a full heartbeat round trip proves the server is usable. A server that
+    # accepts and then drops the connection keeps backing off.
+    link.backoff.reset()
+    event_list = data.get('eventList', [])
+    client_list = data.get('clientList', [])
+
+    link.is_armed = data.get('isArmed', False)
+
+    # Servers supporting delta sync advertise a 'version' cursor. Anything else
+    # is treated as a full snapshot, and 'get' keeps being sent without a cursor.
+    is_delta = data.get('isDelta', False) and link.sync_version is not None
+    states.apply_client_list(link.client_map, client_list, data.get('removedClients', []), is_delta)
+    link.sync_version = data.get('version', None)
+    # Each server only sees the clients connected to it: judge on all of them together
+    states.merge_links(other for other in links if other is link or other.is_healthy())
 
     new_event_list = []
     acked_event_list = []
@@ -166,13 +253,13 @@ async def on_get_result(data = {}):
 
     if new_event_list:
         log.warning(f'Detected a delay in processing event: {len(event_list)} events in queue')
-        tasks = [handle_event(event, is_internal=False) for event in new_event_list]
+        tasks = [handle_event(event, is_internal=False, link=link) for event in new_event_list]
         await asyncio.gather(*tasks)
 
     for event in acked_event_list: # ACK again just to make sure
-        await sio.emit('ack', {'id': event['id']})
+        await link.sio.emit('ack', {'id': event['id']})
 
-    await sio.emit('pong')
+    await link.sio.emit('pong')
 
     if (states.is_armed and
         (len(states.client_list_pc) == 0 or
@@ -189,14 +276,35 @@ async def on_get_result(data = {}):
     elif (states.is_armed and states.current_event == 'self_client_zero_client'):
         warn.stop('self_client_zero_client')
 
+    log.debug(f'get_result from {link.url} handled in {(time.process_time() - cpu_start) * 1000:.3f}ms CPU '
+              f'(delta: {is_delta}, version: {link.sync_version}, clients: {len(client_list)}, events: {len(event_list)}, '
+              f'clock: {link.clock.get_metrics()})')
+
+def create_client(link: ServerLink, http_session: aiohttp.ClientSession = None) -> socketio.AsyncClient:
+    # Reconnection is driven by run_link, not by python-socketio
+    sio = socketio.AsyncClient(serializer=get_serializer(), reconnection=False, http_session=http_session)
+    sio.on('connect', functools.partial(on_connect, link))
+    sio.on('disconnect', functools.partial(on_disconnect, link))
+    sio.on('event', functools.partial(on_event, link))
+    sio.on('event_ignored', functools.partial(on_event_ignored, link))
+    sio.on('ping', functools.partial(on_ping, link))
+    sio.on('get_result', functools.partial(on_get_result, link))
+    return sio
+
+def create_link(index: int, url: str) -> ServerLink:
+    link = ServerLink(index, url, None)
+    link.sio = create_client(link)
+    return link
+
+links = [create_link(index, url) for index, url in enumerate(config.ice_server_urls)]
+
 async def connection_monitoring_worker():
     await asyncio.sleep(1) # Grace startup (prevent rush alert)
     while True:
         try:
-            time_now = datetime.datetime.now()
-            time_diff = time_now - states.last_heartbeat
-            if not states.is_connected or time_diff.total_seconds() > 1:
-                states.is_connected = False
+            # Only warn when every server link is down
+            states.is_connected = any(link.is_healthy() for link in links)
+            if not states.is_connected:
                 event_payload = {
                     'id': str(uuid.uuid4()),
                     'event': 'disconnected',
@@ -212,25 +320,113 @@ async def connection_monitoring_worker():
             log.info('Stopping connection monitoring worker...')
             break
 
+async def clock_metrics_worker():
+    while True:
+        try:
+            await asyncio.sleep(config.clock_metrics_interval)
+            for link in links:
+                if not link.clock.is_synced:
+                    continue
+                metrics = link.clock.get_metrics()
+                latency = ', '.join(f'{name} {metrics[f"delivery_latency_{name}"] * 1000:.1f}ms'
+                                    for name in ('last', 'p50', 'p99') if metrics[f'delivery_latency_{name}'] is not None)
+                log.info(f'[CLOCK] {link.url}: RTT {metrics["rtt"] * 1000:.1f}ms, offset {metrics["offset"] * 1000:+.1f}ms, '
+                         f'event delivery latency: {latency or "no events yet"}')
+        except asyncio.CancelledError:
+            log.info('Stopping clock metrics worker...')
+            break
+
+async def run_link(link: ServerLink):
+    url = urllib.parse.urlsplit(link.url)
+    host, port = url.hostname, url.port or (443 if url.scheme in ('https', 'wss') else 80)
+    await link.resolver.refresh(host, port)
+
+    # Shared session so every reconnect goes through the pre-resolved addresses.
+    # aiohttp needs a running loop for it, so the client is rebuilt here.
+    http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(resolver=link.resolver, use_dns_cache=False))
+    link.sio = create_client(link, http_session)
+    transports = ['websocket'] if config.websocket_only else None
+
+    link.reconnect_started_at = time.monotonic()
+    try:
+        while True:
+            log.info(f'Starting main loop for {link.url}...')
+            try:
+                link.connection_lost.clear()
+                await link.sio.connect(link.url, transports=transports, wait_timeout=config.handshake_timeout)
+                link.handshake_failures = 0
+                # sio.wait() adds a fixed 1s sleep after the transport drops
+                await link.connection_lost.wait()
+            except socketio.exceptions.ConnectionError as e:
+                # Engine.IO transport came up but the socket.io CONNECT got no answer in
+                # time. A slow server looks the same as one using another serializer
+                # (it drops packets it cannot decode), so only repeated silence counts.
+                if e.__cause__ is None and not link.sio.failed_namespaces:
+                    link.handshake_failures += 1
+                    log.error(f'No socket.io handshake answer from {link.url} within {config.handshake_timeout}s '
+                              f'({link.handshake_failures} in a row)')
+                    if link.handshake_failures >= config.handshake_max_failures:
+                        log.critical(f'No handshake answer from {link.url} after {link.handshake_failures} attempts. '
+                                     f'Check that \'serializer\' (\'{config.serializer}\') in config matches the server.',
+                                     extra={'rate_key': f'handshake_{link.url}'})
+                        if config.serializer != 'json':
+                            return
+                else:
+                    log.error(f'Error in main loop for {link.url}: {e}')
+            except Exception as e:
+                log.error(f'Error in main loop for {link.url}: {e}')
+            finally:
+                await link.sio.disconnect()
+                if link.reconnect_started_at is None:
+                    link.reconnect_started_at = time.monotonic()
+
+            delay = link.backoff.next_delay()
+            log.info(f'Reconnecting to {link.url} in {delay:.2f}s (attempt {link.backoff.attempt})')
+            # Slow DNS must not stretch the backoff: refresh in the background, one at a time
+            if link.refresh_task is None or link.refresh_task.done():
+                link.refresh_task = asyncio.create_task(link.resolver.refresh(host, port))
+            await asyncio.sleep(delay)
+    finally:
+        if link.refresh_task is not None:
+            link.refresh_task.cancel()
+        await http_session.close()
+
 async def main():
+    if config.capture_file:
+        capture.start(config.capture_file)
+    if config.archive_path:
+        archive.start(config.archive_path)
+    if config.profiling_enabled:
+        await profiler.start()
     log.info('Starting background workers...')
     kill.start_worker()
     asyncio.create_task(states.clear_old_events_worker())
     asyncio.create_task(connection_monitoring_worker())
-    while True:
-        log.info('Starting main loop...')
-        try:
-            await sio.connect(config.ice_server_url)
-            await sio.wait()
-        except Exception as e:
-            log.error(f'Error in main loop: {e}')
-        finally:
-            await sio.disconnect()
-            await asyncio.sleep(0.1)
+    if config.clock_metrics_interval > 0:
+        asyncio.create_task(clock_metrics_worker())
+
+    # A link loop only returns on a fatal error for that link. The others keep
+    # running; the client exits once every link has failed.
+    link_tasks = {asyncio.create_task(run_link(link)): link for link in links}
+    pending = set(link_tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                log.error(f'Link to {link_tasks[task].url} crashed: {task.exception()}')
+            log.critical(f'Gave up on server {link_tasks[task].url}. {len(pending)} of {len(links)} links left.')
+    log.critical('Every server link failed. Exiting...')
+    kill.stop_worker()
 
 if __name__ == '__main__':
-    if not is_admin_windows():
-        log.critical(f'Client app is not running as administrator. Relaunch app with administrator privileges.')
-        log.info('Exiting...')
-        sys.exit(1)
-    asyncio.run(main())
\ No newline at end of file
+    setup_logging()
+    try:
+        if not is_admin_windows():
+            log.critical(f'Client app is not running as administrator. Relaunch app with administrator privileges.')
+            log.info('Exiting...')
+            sys.exit(1)
+        asyncio.run(main())
+    finally:
+        capture.stop()
+        archive.stop()
+        stop_logging()
\ No newline at end of file
@@ -1,4 +1,5 @@
 from typing import Union
+import time
 import datetime
 
 class Event:
@@ -9,7 +10,8 @@ class Event:
                  type: str,
                  source: str,
                  timestamp: Union[str, datetime.datetime],
-                 data: dict = None):
+                 data: dict = None,
+                 monotonic_timestamp: float = None):
 
         self.is_internal: bool = is_internal
         self.id: str = id
@@ -17,4 +19,8 @@ class Event:
         self.type: str = type
         self.source: str = source
         self.timestamp: datetime.datetime = timestamp if isinstance(timestamp, datetime.datetime) else datetime.datetime.fromisoformat(timestamp)
-        self.data: Union[dict, None] = data if data is not None else {}
\ No newline at end of file
+        self.data: Union[dict, None] = data if data is not None else {}
+        self.received_at: float = time.monotonic()
+        # When the event happened on the time.monotonic() timebase. Internal events
+        # and events received before the server clock is known use the receive time.
+        self.monotonic_timestamp: float = monotonic_timestamp if monotonic_timestamp is not None else self.received_at
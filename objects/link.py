@@ -0,0 +1,41 @@
+from typing import Union
+from collections import deque
+import time
+import asyncio
+
+import socketio
+
+from utils.clock import ServerClock
+from utils.reconnect import Backoff, PreResolvingResolver
+
+
+class ServerLink:
+    def __init__(self,
+                 index: int,
+                 url: str,
+                 sio: Union[socketio.AsyncClient, None]):
+
+        self.index: int = index
+        self.url: str = url
+        self.sio: Union[socketio.AsyncClient, None] = sio
+
+        self.is_connected: bool = False
+        self.connection_lost: asyncio.Event = asyncio.Event()
+        self.last_heartbeat: float = float('-inf') # time.monotonic()
+
+        # Delta sync cursor and client bookkeeping are per server
+        self.sync_version: Union[int, None] = None
+        self.client_map: dict = {}
+        self.is_armed: bool = False
+
+        self.clock: ServerClock = ServerClock()
+
+        self.backoff: Backoff = Backoff()
+        self.resolver: PreResolvingResolver = PreResolvingResolver()
+        self.refresh_task: Union[asyncio.Task, None] = None # background DNS refresh
+        self.reconnect_started_at: Union[float, None] = None # time.monotonic()
+        self.handshake_failures: int = 0 # unanswered socket.io handshakes in a row
+        self.reintroduce_times: deque = deque(maxlen=100) # seconds from link loss to 'introduce'
+
+    def is_healthy(self, heartbeat_timeout: float = 1) -> bool:
+        return self.is_connected and time.monotonic() - self.last_heartbeat <= heartbeat_timeout
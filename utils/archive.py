@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Union
+
+from utils.config import config
+
+if TYPE_CHECKING:
+    from objects.event import Event
+
+log = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.jsonl'
+
+
+def _guess_extension(image_bytes: bytes) -> str:
+    if image_bytes.startswith(b'\xff\xd8'):
+        return 'jpg'
+    if image_bytes.startswith(b'\x89PNG'):
+        return 'png'
+    return 'bin'
+
+
+class EvidenceArchive:
+    """
+    Size- and age-bounded ring directory of alert frames, one entry per event.
+
+    All disk work runs on a single background writer thread, so save_frame()
+    never blocks the caller. index.jsonl is an append-only log of entry
+    updates/removals, replayed on startup, so lookups by event ID never scan
+    the directory. Eviction is least recently used first (lookup() counts as use).
+    """
+    def __init__(self):
+        self.path: Union[str, None] = None
+        self.is_enabled: bool = False
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict() # event id -> entry, LRU first
+        self._total_bytes: int = 0
+        self._index_lines: int = 0
+        self._executor: Union[ThreadPoolExecutor, None] = None
+
+    def start(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._load_index()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='archive-writer')
+        self.is_enabled = True
+        self._executor.submit(self._evict)
+        log.info(f'Archiving alert frames to \'{path}\' ({len(self._entries)} events, {self._total_bytes} bytes)')
+
+    def stop(self):
+        if not self.is_enabled:
+            return
+        self.is_enabled = False
+        self._executor.shutdown(wait=True)
+
+    def save_frame(self, event: 'Event', camera_name: str, image_bytes: bytes):
+        if not self.is_enabled or not image_bytes:
+            return
+        metadata = {
+            'id': event.id,
+            'event': event.event,
+            'type': event.type,
+            'source': event.source,
+            'timestamp': event.timestamp.isoformat(),
+            'data': event.data,
+        }
+        self._executor.submit(self._write_frame, metadata, camera_name, image_bytes)
+
+    def lookup(self, event_id: str) -> Union[dict, None]:
+        '''Entry of an archived event ({'files': [...], 'metadata': ..., ...}), or None'''
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(event_id)
+            entry['last_used'] = time.time()
+            return dict(entry, files=[os.path.join(self.path, name) for name in entry['files']])
+
+    def _write_frame(self, metadata: dict, camera_name: str, image_bytes: bytes):
+        try:
+            event_id = metadata['id']
+            safe_camera = ''.join(c if c.isalnum() or c in '-_' else '_' for c in camera_name)
+            safe_event = ''.join(c if c.isalnum() or c in '-_' else '_' for c in event_id)
+            name = f'{safe_event}_{safe_camera}_{int(time.time() * 1000)}.{_guess_extension(image_bytes)}'
+            with open(os.path.join(self.path, name), 'wb') as f:
+                f.write(image_bytes)
+
+            with self._lock:
+                time_now = time.time()
+                entry = self._entries.get(event_id)
+                if entry is None:
+                    entry = {'id': event_id, 'created': time_now, 'last_used': time_now,
+                             'bytes': 0, 'files': [], 'metadata': metadata}
+                    self._entries[event_id] = entry
+                entry['files'].append(name)
+                entry['bytes'] += len(image_bytes)
+                entry['last_used'] = time_now
+                self._entries.move_to_end(event_id)
+                self._total_bytes += len(image_bytes)
+                self._append_index(entry)
+
+            self._evict()
+        except Exception as e:
+            log.error(f'Failed to archive frame for event {metadata.get("id")}: {e}')
+
+    def _evict(self):
+        with self._lock:
+            max_age = config.archive_max_age_days * 86400
+            time_now = time.time()
+            while self._entries:
+                event_id, entry = next(iter(self._entries.items()))
+                if self._total_bytes <= config.archive_max_bytes and time_now - entry['created'] <= max_age:
+                    # LRU order is not age order: catch expired entries further in
+                    expired = [key for key, value in self._entries.items() if time_now - value['created'] > max_age]
+                    if not expired:
+                        break
+                    event_id = expired[0]
+                    entry = self._entries[event_id]
+                self._remove(event_id, entry)
+
+            if self._index_lines > 2 * len(self._entries) + 64:
+                self._compact_index()
+
+    def _remove(self, event_id: str, entry: dict):
+        for name in entry['files']:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                log.warning(f'Failed to evict \'{name}\': {e}')
+        del self._entries[event_id]
+        self._total_bytes -= entry['bytes']
+        self._append_index({'id': event_id, 'removed': True})
+        log.debug(f'Evicted archived event {event_id} ({entry["bytes"]} bytes)')
+
+    def _append_index(self, record: dict):
+        with open(os.path.join(self.path, INDEX_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._index_lines += 1
+
+    def _compact_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(index_path + '.tmp', index_path)
+        self._index_lines = len(self._entries)
+
+    def _load_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._index_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # torn last line after a crash
+                    self._entries.pop(record['id'], None)
+                    if not record.get('removed'):
+                        self._entries[record['id']] = record
+            # Re-sort by last use so eviction order survives restarts
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1]['last_used']))
+            self._total_bytes = sum(entry['bytes'] for entry in self._entries.values())
+        except Exception as e:
+            log.error(f'Failed to load archive index: {e}')
+
+
+archive = EvidenceArchive()
@@ -0,0 +1,112 @@
+import os
+import gzip
+import zlib
+import json
+import time
+import logging
+import datetime
+import threading
+from queue import SimpleQueue
+from typing import Iterator, Tuple, Union
+
+log = logging.getLogger(__name__)
+
+CAPTURE_VERSION = 1
+
+
+class TrafficRecorder:
+    """
+    Records inbound socket.io messages to a JSON-lines file, one file per run
+    (`captureFile` with a start timestamp added to the name).
+
+    Records are plain lines flushed as they go, so a run killed mid-write loses
+    at most its last partial line and never touches other runs' files.
+    The first line is a header, every following line is `[offset, name, data, link]`
+    where offset is seconds on time.monotonic() since the capture started and
+    link is the index of the server link the message arrived on.
+    Writes happen on a background thread; record() only enqueues.
+    """
+    def __init__(self):
+        self.path: Union[str, None] = None
+        self.is_enabled: bool = False
+        self._started_at: float = 0
+        self._queue: SimpleQueue = SimpleQueue()
+        self._thread: Union[threading.Thread, None] = None
+
+    def start(self, path: str):
+        self.path = get_session_path(path)
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._writer, name='capture-writer', daemon=True)
+        self._thread.start()
+        self.is_enabled = True
+        log.info(f'Capturing inbound traffic to \'{self.path}\'')
+
+    def stop(self):
+        if not self.is_enabled:
+            return
+        self.is_enabled = False
+        self._queue.put(None)
+        self._thread.join() # drain everything still queued
+
+    def record(self, name: str, data = None, link_index: int = 0):
+        if self.is_enabled:
+            self._queue.put((time.monotonic() - self._started_at, name, data, link_index))
+
+    def _writer(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                header = {'version': CAPTURE_VERSION, 'started': datetime.datetime.now().isoformat()}
+                f.write(json.dumps(header) + '\n')
+                while True:
+                    item = self._queue.get()
+                    if item is None:
+                        break
+                    offset, name, data, link_index = item
+                    f.write(json.dumps([round(offset, 6), name, data, link_index], separators=(',', ':'), default=str) + '\n')
+                    if self._queue.empty():
+                        f.flush()
+        except Exception as e:
+            self.is_enabled = False
+            log.error(f'Traffic capture stopped: {e}')
+
+
+def get_session_path(path: str) -> str:
+    '''capture.jsonl -> capture-20260101-120000-<pid>.jsonl'''
+    if path.endswith('.gz'):
+        path = path[:-3]
+    root, extension = os.path.splitext(path)
+    return f'{root}-{datetime.datetime.now().strftime("%Y%m%d-%H%M%S")}-{os.getpid()}{extension or ".jsonl"}'
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, str, Union[dict, None], int]]:
+    # Older gzip captures append every run to one file, each run with its own
+    # header and offsets restarting at zero; sessions are laid out back to back.
+    base = 0
+    last_offset = 0
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        lines = iter(f)
+        while True:
+            try:
+                item = json.loads(next(lines))
+            except StopIteration:
+                break
+            except (EOFError, OSError, zlib.error, json.JSONDecodeError):
+                # Client killed mid-write: keep everything before the cut
+                log.warning(f'Capture \'{path}\' is truncated. Replaying up to the cut.')
+                break
+
+            if isinstance(item, dict):
+                if item.get('version') != CAPTURE_VERSION:
+                    raise ValueError(f'Unsupported capture version: {item.get("version")}')
+                base = last_offset
+                continue
+            offset, name, data = item[:3]
+            last_offset = base + offset
+            yield last_offset, name, data, item[3] if len(item) > 3 else 0
+
+
+capture = TrafficRecorder()
@@ -0,0 +1,105 @@
+import time
+import logging
+import datetime
+import statistics
+from collections import deque
+from typing import Tuple, Union
+
+log = logging.getLogger(__name__)
+
+SAMPLE_WINDOW = 16 # round trips kept for offset estimation
+LATENCY_WINDOW = 256 # delivery latencies kept for the metric
+
+
+class ServerClock:
+    """
+    Estimates the server clock against the local time.monotonic() timebase from
+    the ping -> get -> get_result round trip (NTP style, minimum-RTT sample wins).
+
+    Server timestamps are mapped straight onto the monotonic clock, so local wall
+    clock steps never affect intervals computed from them.
+    """
+    def __init__(self):
+        self._pending_since: Union[float, None] = None
+        self._samples = deque(maxlen=SAMPLE_WINDOW) # (rtt, server_minus_monotonic, server_minus_wall)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+        self.rtt: Union[float, None] = None
+        self.server_minus_monotonic: Union[float, None] = None
+        self.offset: Union[float, None] = None # server wall clock - local wall clock, in seconds
+        self.is_zone_aware: Union[bool, None] = None # whether serverTime carries its time zone
+
+    @property
+    def is_synced(self) -> bool:
+        return self.server_minus_monotonic is not None
+
+    def start_round_trip(self):
+        self._pending_since = time.monotonic()
+
+    def finish_round_trip(self, server_time):
+        sent_at = self._pending_since
+        self._pending_since = None
+        if sent_at is None or server_time is None:
+            return
+
+        parsed = parse_server_time(server_time)
+        if parsed is None:
+            return
+        server_epoch, self.is_zone_aware = parsed
+
+        received_at = time.monotonic()
+        rtt = received_at - sent_at
+        midpoint = sent_at + rtt / 2
+        wall_midpoint = time.time() - rtt / 2
+        self._samples.append((rtt, server_epoch - midpoint, server_epoch - wall_midpoint))
+
+        best = min(self._samples, key=lambda sample: sample[0])
+        self.rtt = best[0]
+        self.server_minus_monotonic = best[1]
+        self.offset = best[2]
+
+    def reset(self):
+        self._pending_since = None
+        self._samples.clear()
+        self.rtt = None
+        self.server_minus_monotonic = None
+        self.offset = None
+        self.is_zone_aware = None
+
+    def to_monotonic(self, server_timestamp: datetime.datetime) -> Union[float, None]:
+        if self.server_minus_monotonic is None:
+            return None
+        # A naive timestamp is read as local time. Against a zone-aware serverTime
+        # (or the other way round) that is off by the time zone difference.
+        if (server_timestamp.tzinfo is not None) != self.is_zone_aware:
+            log.warning(f'Event timestamps and serverTime disagree on carrying a time zone '
+                        f'(event: {server_timestamp.isoformat()}). Using receive times.',
+                        extra={'rate_key': 'clock_zone_mismatch'})
+            return None
+        return server_timestamp.timestamp() - self.server_minus_monotonic
+
+    def record_delivery_latency(self, latency: float):
+        self._latencies.append(latency)
+
+    def get_metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            'rtt': self.rtt,
+            'offset': self.offset,
+            'delivery_latency_last': self._latencies[-1] if self._latencies else None,
+            'delivery_latency_p50': statistics.median(latencies) if latencies else None,
+            'delivery_latency_p99': latencies[min(len(latencies) - 1, int(len(latencies) * .99))] if latencies else None,
+        }
+
+
+def parse_server_time(server_time) -> Union[Tuple[float, bool], None]:
+    """ISO 8601 string or epoch milliseconds -> (epoch seconds, whether it is zone aware)."""
+    try:
+        if isinstance(server_time, (int, float)):
+            return server_time / 1000, True
+        server_datetime = datetime.datetime.fromisoformat(server_time)
+        return server_datetime.timestamp(), server_datetime.tzinfo is not None
+    except Exception as e:
+        log.debug(f'Invalid server time \'{server_time}\': {e}')
+        return None
+
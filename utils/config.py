@@ -6,10 +6,54 @@ CONFIG_PATH = 'config.json'
 
 log = logging.getLogger(__name__)
 
+# Socket.IO
+EVENT_DEDUPE_WINDOW = 60 # in seconds
+CLOCK_METRICS_INTERVAL = 60 # in seconds, 0 disables the periodic clock/latency log line
+RECONNECT_FIRST_DELAY = 0.1 # in seconds
+RECONNECT_BASE_DELAY = 0.5 # in seconds
+RECONNECT_MAX_DELAY = 10 # in seconds
+HANDSHAKE_TIMEOUT = 5 # in seconds, for the socket.io CONNECT answer
+HANDSHAKE_MAX_FAILURES = 5 # unanswered handshakes in a row before a link gives up
+SERIALIZERS = ('json', 'msgpack')
+
+# Logging
+LOG_LEVEL = 'INFO'
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+LOG_RATE_LIMIT_COUNT = 5 # per message key, 0 disables rate limiting
+LOG_RATE_LIMIT_PERIOD = 10 # in seconds
+
+# Camera
+CAMERA_CONCURRENCY = 4
+CAMERA_TIMEOUT = 3 # per camera, in seconds
+CAMERA_REFRESH_INTERVAL = 2 # in seconds, refetch while an alert overlay is up, 0 disables
+
+# Evidence Archive
+ARCHIVE_MAX_BYTES = 512 * 1024 * 1024
+ARCHIVE_MAX_AGE_DAYS = 30
+
+# Profiling
+PROFILING_PORT = 8765
+PROFILING_DIRECTORY = 'profiles'
+PROFILING_SECONDS = 10
+PROFILING_MODE = 'cprofile' # or 'sampling'
+PROFILING_SAMPLE_INTERVAL_MS = 5
+PROFILING_SLOW_CALLBACK_MS = 50
+
 # Warn Common
 WARN_OVERLAY_DURATION = 10 # in seconds
 WARN_SOUND_LOOP = 2
 
+# Storm Control
+STORM_CONTROL_BURST = 3 # fresh warnings per key before suppression kicks in
+STORM_CONTROL_REFILL_SECONDS = 30 # one token back every N seconds
+
+# Frame change detection
+FRAME_CHANGE_THRESHOLD = 1.0 # percent of thumbnail pixels that must change
+FRAME_CHANGE_PIXEL_DELTA = 16 # gray levels (0-255) before a pixel counts as changed
+FRAME_CHANGE_THUMBNAIL_WIDTH = 32
+FRAME_CHANGE_THUMBNAIL_HEIGHT = 18
+
 # Overlay
 WINDOW_WIDTH = 400
 WINDOW_HEIGHT = 273
@@ -25,8 +69,33 @@ BACKGROUND_COLOR = QColor(0, 0, 0)  # Black
 class Config:
     def __init__(self):
         self.ice_server_url = None
+        self.ice_server_urls = []
+        self.event_dedupe_window = EVENT_DEDUPE_WINDOW
+        self.clock_metrics_interval = CLOCK_METRICS_INTERVAL
+        self.websocket_only = True
+        self.reconnect_first_delay = RECONNECT_FIRST_DELAY
+        self.reconnect_base_delay = RECONNECT_BASE_DELAY
+        self.reconnect_max_delay = RECONNECT_MAX_DELAY
+        self.handshake_timeout = HANDSHAKE_TIMEOUT
+        self.handshake_max_failures = HANDSHAKE_MAX_FAILURES
         self.client_name = None
         self.camera_frame_url = None
+        self.cameras = []
+        self.camera_concurrency = CAMERA_CONCURRENCY
+        self.camera_timeout = CAMERA_TIMEOUT
+        self.camera_refresh_interval = CAMERA_REFRESH_INTERVAL
+
+        self.profiling_enabled = False
+        self.profiling_port = PROFILING_PORT
+        self.profiling_directory = PROFILING_DIRECTORY
+        self.profiling_seconds = PROFILING_SECONDS
+        self.profiling_mode = PROFILING_MODE
+        self.profiling_sample_interval_ms = PROFILING_SAMPLE_INTERVAL_MS
+        self.profiling_slow_callback_ms = PROFILING_SLOW_CALLBACK_MS
+
+        self.archive_path = None
+        self.archive_max_bytes = ARCHIVE_MAX_BYTES
+        self.archive_max_age_days = ARCHIVE_MAX_AGE_DAYS
 
         self.obs_enabled = False
         self.obs_host = None
@@ -34,8 +103,28 @@ class Config:
         self.obs_password = None
 
         self.kill_config = {}
+        self.dispatch_rules = []
+
+        self.delta_sync = True
+        self.serializer = 'json'
+        self.capture_file = None
+
+        self.log_level = LOG_LEVEL
+        self.log_file = None
+        self.log_file_max_bytes = LOG_FILE_MAX_BYTES
+        self.log_file_backup_count = LOG_FILE_BACKUP_COUNT
+        self.log_rate_limit_count = LOG_RATE_LIMIT_COUNT
+        self.log_rate_limit_period = LOG_RATE_LIMIT_PERIOD
 
         self.warn_overlay_duration = WARN_OVERLAY_DURATION
+        self.storm_control_enabled = True
+        self.storm_control_burst = STORM_CONTROL_BURST
+        self.storm_control_refill_seconds = STORM_CONTROL_REFILL_SECONDS
+        self.frame_change_enabled = True
+        self.frame_change_threshold = FRAME_CHANGE_THRESHOLD
+        self.frame_change_pixel_delta = FRAME_CHANGE_PIXEL_DELTA
+        self.frame_change_thumbnail_width = FRAME_CHANGE_THUMBNAIL_WIDTH
+        self.frame_change_thumbnail_height = FRAME_CHANGE_THUMBNAIL_HEIGHT
         self.window_width = WINDOW_WIDTH
         self.window_height = WINDOW_HEIGHT
         self.global_opacity = GLOBAL_OPACITY
@@ -56,9 +145,40 @@ class Config:
             log.critical(f'Failed to load config file: {e}')
 
         try:
-            self.ice_server_url = config_data['iceServerURL']
+            self.ice_server_urls = config_data.get('iceServerURLs', None) or [config_data['iceServerURL']]
+            self.ice_server_url = self.ice_server_urls[0]
+            self.event_dedupe_window = config_data.get('eventDedupeWindow', EVENT_DEDUPE_WINDOW)
+            self.clock_metrics_interval = config_data.get('clockMetricsInterval', CLOCK_METRICS_INTERVAL)
+
+            reconnect_config = config_data.get('reconnect', {})
+            self.websocket_only = reconnect_config.get('websocketOnly', True)
+            self.reconnect_first_delay = reconnect_config.get('firstDelay', RECONNECT_FIRST_DELAY)
+            self.reconnect_base_delay = reconnect_config.get('baseDelay', RECONNECT_BASE_DELAY)
+            self.reconnect_max_delay = reconnect_config.get('maxDelay', RECONNECT_MAX_DELAY)
+            self.handshake_timeout = reconnect_config.get('handshakeTimeout', HANDSHAKE_TIMEOUT)
+            self.handshake_max_failures = reconnect_config.get('handshakeMaxFailures', HANDSHAKE_MAX_FAILURES)
             self.client_name = config_data['clientName']
-            self.camera_frame_url = config_data['cameraFrameURL']
+            self.camera_frame_url = config_data.get('cameraFrameURL', None)
+            self.cameras = config_data.get('cameras', [])
+            if not self.cameras and self.camera_frame_url:
+                self.cameras = [{'name': 'camera', 'url': self.camera_frame_url}]
+            self.camera_concurrency = config_data.get('cameraConcurrency', CAMERA_CONCURRENCY)
+            self.camera_timeout = config_data.get('cameraTimeout', CAMERA_TIMEOUT)
+            self.camera_refresh_interval = config_data.get('cameraRefreshInterval', CAMERA_REFRESH_INTERVAL)
+
+            profiling_config = config_data.get('profiling', {})
+            self.profiling_enabled = profiling_config.get('enabled', False)
+            self.profiling_port = profiling_config.get('port', PROFILING_PORT)
+            self.profiling_directory = profiling_config.get('directory', PROFILING_DIRECTORY)
+            self.profiling_seconds = profiling_config.get('seconds', PROFILING_SECONDS)
+            self.profiling_mode = profiling_config.get('mode', PROFILING_MODE)
+            self.profiling_sample_interval_ms = profiling_config.get('sampleIntervalMs', PROFILING_SAMPLE_INTERVAL_MS)
+            self.profiling_slow_callback_ms = profiling_config.get('slowCallbackMs', PROFILING_SLOW_CALLBACK_MS)
+
+            archive_config = config_data.get('archive', {})
+            self.archive_path = archive_config.get('path', None)
+            self.archive_max_bytes = archive_config.get('maxBytes', ARCHIVE_MAX_BYTES)
+            self.archive_max_age_days = archive_config.get('maxAgeDays', ARCHIVE_MAX_AGE_DAYS)
 
             obs_config = config_data.get('obs', {})
             self.obs_host = obs_config.get('host', None)
@@ -67,8 +187,42 @@ class Config:
             self.obs_enabled = self.obs_host is not None and self.obs_port is not None
 
             self.kill_config = config_data.get('kill', {})
+            self.dispatch_rules = config_data.get('dispatch', [])
+
+            self.delta_sync = config_data.get('deltaSync', True)
+            self.serializer = config_data.get('serializer', 'json')
+            if self.serializer not in SERIALIZERS:
+                log.critical(f'Unknown serializer \'{self.serializer}\'. Falling back to \'json\'.')
+                self.serializer = 'json'
+
+            self.capture_file = config_data.get('captureFile', None)
+
+            storm_config = config_data.get('stormControl', {})
+            self.storm_control_enabled = storm_config.get('enabled', True)
+            self.storm_control_burst = storm_config.get('burst', STORM_CONTROL_BURST)
+            self.storm_control_refill_seconds = storm_config.get('refillSeconds', STORM_CONTROL_REFILL_SECONDS)
+
+            frame_change_config = config_data.get('frameChange', {})
+            self.frame_change_enabled = frame_change_config.get('enabled', True)
+            self.frame_change_threshold = frame_change_config.get('threshold', FRAME_CHANGE_THRESHOLD)
+            self.frame_change_pixel_delta = frame_change_config.get('pixelDelta', FRAME_CHANGE_PIXEL_DELTA)
+            self.frame_change_thumbnail_width = frame_change_config.get('thumbnailWidth', FRAME_CHANGE_THUMBNAIL_WIDTH)
+            self.frame_change_thumbnail_height = frame_change_config.get('thumbnailHeight', FRAME_CHANGE_THUMBNAIL_HEIGHT)
+
+            logging_config = config_data.get('logging', {})
+            self.log_level = logging_config.get('level', LOG_LEVEL).upper()
+            self.log_file = logging_config.get('file', None)
+            self.log_file_max_bytes = logging_config.get('fileMaxBytes', LOG_FILE_MAX_BYTES)
+            self.log_file_backup_count = logging_config.get('fileBackupCount', LOG_FILE_BACKUP_COUNT)
+            self.log_rate_limit_count = logging_config.get('rateLimitCount', LOG_RATE_LIMIT_COUNT)
+            self.log_rate_limit_period = logging_config.get('rateLimitPeriod', LOG_RATE_LIMIT_PERIOD)
 
         except Exception as e:
             log.critical(f'Failed to parse config file: {e}')
 
+    def get_cameras(self, source: str) -> list:
+        '''Cameras listing `source` in their 'sources', or every camera if none does'''
+        matching = [camera for camera in self.cameras if source in camera.get('sources', [])]
+        return matching or self.cameras
+
 config = Config()
@@ -0,0 +1,186 @@
+import logging
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+
+from utils.config import config
+from utils.states import states
+
+if TYPE_CHECKING:
+    from objects.event import Event
+
+log = logging.getLogger(__name__)
+
+WILDCARD = '*'
+ACTIONS = ('warn', 'fetch_frame', 'kill', 'stop_warn')
+DEDUPE_BY = ('type', 'event')
+
+# Built-in behaviour. Rules from config with the same (source, type, event) replace these.
+DEFAULT_RULES = [
+    {
+        'source': 'server', 'type': 'client', 'event': WILDCARD,
+        'log': '[CLIENT] Client \'{client_name}\' {event}', 'logLevel': 'INFO',
+    },
+    {
+        'source': 'self', 'type': 'client', 'event': 'zero_client',
+        'actions': ['warn'], 'dedupeBy': 'event',
+        'title': 'ZERO CLIENT', 'message': 'PC: {pc}, HA: {ha}, HTML: {html}', 'noAudio': True,
+        'log': '[CLIENT] Zero client detected: PC: {pc}, HA: {ha}, HTML: {html}', 'logLevel': 'WARNING',
+    },
+    {
+        'source': WILDCARD, 'type': 'connection', 'event': WILDCARD,
+        'actions': ['warn'], 'dedupeBy': 'event',
+        'title': '{EVENT}', 'message': 'SERVER DISCONNECTED', 'noAudio': True,
+        'log': '[CONNECTION] Server {event}.', 'logLevel': 'WARNING',
+    },
+    {
+        'source': WILDCARD, 'type': 'onvif', 'event': WILDCARD,
+        'actions': ['warn', 'fetch_frame'], 'dedupeBy': 'type',
+        'title': 'MOTION DETECTED', 'message': 'Loading...', 'priority': True,
+        'log': '[ONVIF] {EVENT} detected.', 'logLevel': 'WARNING',
+    },
+    {
+        'source': WILDCARD, 'type': 'user', 'event': WILDCARD,
+    },
+    {
+        'source': WILDCARD, 'type': 'user', 'event': 'kill',
+        'actions': ['warn', 'kill'],
+        'title': 'KILLING', 'message': 'KILLING...\n(mode: {kill_mode})', 'noAudio': True, 'priority': True,
+        'log': '[USER] {EVENT} Initiated. (Kill mode: {kill_mode})', 'logLevel': 'WARNING',
+    },
+    {
+        'source': WILDCARD, 'type': 'user', 'event': 'ignore',
+        'actions': ['stop_warn'],
+        'log': '[USER] {EVENT} Initiated.', 'logLevel': 'INFO',
+    },
+]
+
+
+class DispatchRule:
+    __slots__ = ('key', 'actions', 'dedupe_by', 'dedupe_window', 'priority', 'no_audio',
+                 'title', 'message', 'log_message', 'log_level', 'is_templated')
+
+    def __init__(self, rule: dict):
+        self.key: Tuple[str, str, str] = (rule.get('source', WILDCARD), rule.get('type', WILDCARD), rule.get('event', WILDCARD))
+
+        self.actions: Tuple[str, ...] = tuple(rule.get('actions', []))
+        for action in self.actions:
+            if action not in ACTIONS:
+                raise ValueError(f'Unknown action \'{action}\' in dispatch rule {self.key}')
+
+        # Events of the same type (or type + event) within the window are dropped
+        self.dedupe_by: Union[str, None] = rule.get('dedupeBy', None)
+        if self.dedupe_by is not None and self.dedupe_by not in DEDUPE_BY:
+            raise ValueError(f'Unknown dedupeBy \'{self.dedupe_by}\' in dispatch rule {self.key}')
+        self.dedupe_window: float = rule.get('dedupeWindow', config.warn_overlay_duration)
+
+        self.priority: bool = rule.get('priority', False)
+        self.no_audio: bool = rule.get('noAudio', False)
+        self.title: str = rule.get('title', '{EVENT}')
+        self.message: Union[str, None] = rule.get('message', None)
+        self.log_message: Union[str, None] = rule.get('log', None)
+        # getLevelName() maps unknown names to 'Level <name>' instead of failing
+        self.log_level: int = logging.getLevelName(str(rule.get('logLevel', 'INFO')).upper())
+        if not isinstance(self.log_level, int):
+            raise ValueError(f'Unknown logLevel \'{rule.get("logLevel")}\' in dispatch rule {self.key}')
+
+        # Static texts skip building the template context on every event
+        texts = [self.log_message]
+        if 'warn' in self.actions:
+            texts += [self.title, self.message]
+        self.is_templated: bool = any(text is not None and '{' in text for text in texts)
+
+
+class DispatchTable:
+    """
+    (source, type, event) -> DispatchRule, built once from DEFAULT_RULES and the
+    'dispatch' config list. Keys may use '*' wildcards; the most specific rule
+    wins (event over type over source), and wildcard resolution is memoized so
+    every dispatch after the first for a key is a single dict lookup.
+    """
+    def __init__(self, rules: List[dict]):
+        self._rules: Dict[Tuple[str, str, str], DispatchRule] = {}
+        for rule in rules:
+            compiled = DispatchRule(rule)
+            self._rules[compiled.key] = compiled
+        self.max_dedupe_window: float = max((rule.dedupe_window for rule in self._rules.values() if rule.dedupe_by is not None), default=0)
+        self._resolved: Dict[Tuple[str, str, str], Union[DispatchRule, None]] = {}
+
+    def lookup(self, source: str, type: str, event: str) -> Union[DispatchRule, None]:
+        key = (source, type, event)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+
+        rule = None
+        for candidate in ((source, type, event),
+                          (WILDCARD, type, event),
+                          (source, type, WILDCARD),
+                          (WILDCARD, type, WILDCARD),
+                          (source, WILDCARD, event),
+                          (WILDCARD, WILDCARD, event),
+                          (source, WILDCARD, WILDCARD),
+                          (WILDCARD, WILDCARD, WILDCARD)):
+            rule = self._rules.get(candidate)
+            if rule is not None:
+                break
+
+        self._resolved[key] = rule
+        return rule
+
+
+# Fields available to a rule's title/message/log templates
+TEMPLATE_FIELDS = {
+    'id': lambda event: event.id,
+    'event': lambda event: event.event,
+    'EVENT': lambda event: event.event.upper(),
+    'type': lambda event: event.type,
+    'source': lambda event: event.source,
+    'data': lambda event: event.data or {},
+    'kill_mode': lambda event: (event.data or {}).get('killMode', 'unknown'),
+    'client_name': lambda event: ((event.data or {}).get('client') or {}).get('name', 'unknown'),
+    'pc': lambda event: len(states.client_list_pc),
+    'ha': lambda event: len(states.client_list_ha),
+    'html': lambda event: len(states.client_list_html),
+}
+
+
+class _TemplateContext(dict):
+    '''Computes only the fields a template actually references'''
+    def __init__(self, event: 'Event'):
+        super().__init__()
+        self.event = event
+
+    def __missing__(self, key):
+        field = TEMPLATE_FIELDS.get(key)
+        if field is None:
+            return '{' + key + '}'
+        value = self[key] = field(self.event)
+        return value
+
+
+def get_template_context(event: 'Event') -> dict:
+    return _TemplateContext(event)
+
+
+def render(template: Union[str, None], context: Union[dict, None]) -> Union[str, None]:
+    if template is None or context is None:
+        return template
+    try:
+        return template.format_map(context)
+    except Exception as e:
+        log.debug(f'Failed to render template \'{template}\': {e}')
+        return template
+
+
+def build_dispatch_table() -> DispatchTable:
+    try:
+        table = DispatchTable(DEFAULT_RULES + config.dispatch_rules)
+    except Exception as e:
+        log.critical(f'Invalid dispatch rules in config: {e}. Using built-in rules only.')
+        table = DispatchTable(DEFAULT_RULES)
+    # Events must outlive the longest dedupe window, or the cleaner cuts it short
+    states.event_retention = max(config.warn_overlay_duration, table.max_dedupe_window)
+    return table
+
+
+dispatch_table = build_dispatch_table()
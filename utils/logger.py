@@ -0,0 +1,166 @@
+import json
+import time
+import logging
+import datetime
+import logging.handlers
+from multiprocessing import Queue
+from typing import Union
+
+from utils.config import config
+
+log = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_log_queue: Union[Queue, None] = None
+_listener: Union['RateLimitedQueueListener', None] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'name': record.name,
+            'process': record.processName,
+            'message': record.getMessage(),
+        }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimiter:
+    """
+    Lets through at most `count` records per message key every `period` seconds.
+    The key is `extra={'rate_key': ...}` when given, the rendered message otherwise.
+    """
+    def __init__(self, count: int, period: float):
+        self.count = count
+        self.period = period
+        self._windows = {} # key -> [window_start, passed, suppressed]
+        self.suppressed_total = {}
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        if self.count <= 0:
+            return True
+
+        key = getattr(record, 'rate_key', None) or (record.name, record.levelno, record.getMessage())
+        time_now = time.monotonic()
+
+        window = self._windows.get(key)
+        if window is None or time_now - window[0] >= self.period:
+            suppressed = window[2] if window is not None else 0
+            self._windows[key] = [time_now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+                record.msg = f'{record.getMessage()} (suppressed {suppressed} similar messages)'
+                record.args = None
+            self._prune(time_now)
+            return True
+
+        if window[1] < self.count:
+            window[1] += 1
+            return True
+
+        window[2] += 1
+        self.suppressed_total[key] = self.suppressed_total.get(key, 0) + 1
+        return False
+
+    def _prune(self, time_now: float):
+        if len(self._windows) < 1024:
+            return
+        self._windows = {key: window for key, window in self._windows.items()
+                         if time_now - window[0] < self.period or window[2]}
+
+
+class RateLimitedQueueListener(logging.handlers.QueueListener):
+    def __init__(self, queue: Queue, *handlers, rate_limiter: RateLimiter):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.rate_limiter = rate_limiter
+
+    def handle(self, record: logging.LogRecord):
+        if self.rate_limiter.allow(record):
+            super().handle(record)
+
+
+def _create_handlers() -> list:
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    handlers = [console_handler]
+
+    if config.log_file:
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                config.log_file,
+                maxBytes=config.log_file_max_bytes,
+                backupCount=config.log_file_backup_count,
+                encoding='utf-8',
+                delay=True
+            )
+            file_handler.setFormatter(JsonLinesFormatter())
+            handlers.append(file_handler)
+        except Exception as e:
+            console_handler.handle(logging.makeLogRecord({
+                'name': __name__,
+                'levelno': logging.ERROR,
+                'levelname': 'ERROR',
+                'msg': f'Failed to open log file \'{config.log_file}\': {e}',
+            }))
+
+    return handlers
+
+
+def setup_logging(log_queue: Queue = None) -> Union[RateLimitedQueueListener, None]:
+    """
+    Routes every log record through a queue so that no handler I/O happens on the caller.
+
+    Called without arguments in the main process: creates the queue and starts the
+    listener that owns the console/file handlers. Worker processes pass the queue
+    they were started with and only get a QueueHandler.
+    """
+    global _log_queue, _listener
+
+    is_main = log_queue is None
+    if is_main:
+        log_queue = Queue()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(config.log_level)
+
+    _log_queue = log_queue
+
+    if is_main:
+        _listener = RateLimitedQueueListener(
+            log_queue,
+            *_create_handlers(),
+            rate_limiter=RateLimiter(config.log_rate_limit_count, config.log_rate_limit_period)
+        )
+        _listener.start()
+        return _listener
+
+    return None
+
+
+def get_log_queue() -> Union[Queue, None]:
+    return _log_queue
+
+
+def get_suppression_counts() -> dict:
+    if _listener is None:
+        return {}
+    return dict(_listener.rate_limiter.suppressed_total)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
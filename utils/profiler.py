@@ -0,0 +1,163 @@
+import os
+import sys
+import signal
+import asyncio
+import cProfile
+import logging
+import datetime
+import threading
+from collections import Counter, deque
+from typing import Union
+
+from aiohttp import web
+
+from utils.config import config
+
+log = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+SLOW_CALLBACK_KEEP = 1000
+
+
+class SlowCallbackCollector(logging.Handler):
+    '''Keeps the "Executing <Handle ...> took N seconds" reports asyncio debug mode logs'''
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.records = deque(maxlen=SLOW_CALLBACK_KEEP)
+
+    def emit(self, record: logging.LogRecord):
+        if record.getMessage().startswith('Executing '):
+            self.records.append(f'{datetime.datetime.fromtimestamp(record.created).isoformat()} {record.getMessage()}')
+
+
+class SamplingProfiler:
+    '''Samples the loop thread's stack from a background thread into folded stacks (flamegraph input)'''
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    """
+    Time-boxed on-demand profiling of the asyncio process.
+
+    Triggered by SIGUSR1 (where the platform has it) or the localhost endpoint
+    `POST /profile?seconds=10&mode=cprofile|sampling`. While a capture runs the
+    loop is in asyncio debug mode, and the slow-callback reports it logs are
+    written next to the profile.
+    """
+    def __init__(self):
+        self.is_running: bool = False
+        self.last_output: Union[list, None] = None
+        self._collector = SlowCallbackCollector()
+        self._runner: Union[web.AppRunner, None] = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        logging.getLogger('asyncio').addHandler(self._collector)
+
+        if hasattr(signal, 'SIGUSR1'):
+            loop.add_signal_handler(signal.SIGUSR1, self.trigger)
+
+        app = web.Application()
+        app.router.add_post('/profile', self._handle_profile)
+        app.router.add_get('/profile', self._handle_status)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', config.profiling_port).start()
+        log.info(f'Profiling endpoint listening on 127.0.0.1:{config.profiling_port}')
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def trigger(self, seconds: float = None, mode: str = None) -> bool:
+        if self.is_running:
+            log.warning('Profile capture already running. Ignoring trigger.')
+            return False
+        self.is_running = True
+        asyncio.get_running_loop().create_task(self.capture(seconds or config.profiling_seconds, mode or config.profiling_mode))
+        return True
+
+    async def capture(self, seconds: float, mode: str):
+        loop = asyncio.get_running_loop()
+        os.makedirs(config.profiling_directory, exist_ok=True)
+        base_path = os.path.join(config.profiling_directory, f'{mode}-{datetime.datetime.now().strftime("%Y%m%d-%H%M%S")}')
+        log.info(f'Capturing {seconds}s {mode} profile to \'{base_path}\'...')
+
+        self._collector.records.clear()
+        loop.slow_callback_duration = config.profiling_slow_callback_ms / 1000
+        loop.set_debug(True)
+
+        try:
+            if mode == 'sampling':
+                sampler = SamplingProfiler(threading.get_ident(), config.profiling_sample_interval_ms / 1000)
+                sampler.start()
+                await asyncio.sleep(seconds)
+                sampler.stop()
+                sampler.dump(base_path + '.folded')
+                outputs = [base_path + '.folded']
+            else:
+                profile = cProfile.Profile()
+                profile.enable()
+                await asyncio.sleep(seconds)
+                profile.disable()
+                profile.dump_stats(base_path + '.prof')
+                outputs = [base_path + '.prof']
+
+            with open(base_path + '.slow.txt', 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self._collector.records))
+            outputs.append(base_path + '.slow.txt')
+
+            self.last_output = outputs
+            log.info(f'Profile written: {outputs} ({len(self._collector.records)} slow callbacks)')
+        except Exception as e:
+            log.error(f'Profile capture failed: {e}')
+        finally:
+            loop.set_debug(False)
+            self.is_running = False
+
+    async def _handle_profile(self, request: web.Request) -> web.Response:
+        try:
+            seconds = float(request.query.get('seconds', config.profiling_seconds))
+        except ValueError:
+            return web.json_response({'error': 'seconds must be a number'}, status=400)
+        mode = request.query.get('mode', config.profiling_mode)
+        if mode not in PROFILE_MODES:
+            return web.json_response({'error': f'mode must be one of {PROFILE_MODES}'}, status=400)
+        if not self.trigger(seconds, mode):
+            return web.json_response({'error': 'capture already running'}, status=409)
+        return web.json_response({'seconds': seconds, 'mode': mode}, status=202)
+
+    async def _handle_status(self, request: web.Request) -> web.Response:
+        return web.json_response({'running': self.is_running, 'lastOutput': self.last_output})
+
+
+profiler = Profiler()
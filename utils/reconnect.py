@@ -0,0 +1,64 @@
+import socket
+import random
+import logging
+from typing import Dict, List, Tuple, Union
+
+from aiohttp.abc import AbstractResolver, ResolveResult
+from aiohttp.resolver import ThreadedResolver
+
+from utils.config import config
+
+log = logging.getLogger(__name__)
+
+
+class Backoff:
+    """
+    Fast first retry, then capped exponential backoff with equal jitter
+    (a random delay between half and all of the capped exponential step).
+    """
+    def __init__(self):
+        self.attempt: int = 0
+
+    def next_delay(self) -> float:
+        self.attempt += 1
+        if self.attempt == 1:
+            return config.reconnect_first_delay
+        delay = min(config.reconnect_max_delay, config.reconnect_base_delay * 2 ** (self.attempt - 2))
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class PreResolvingResolver(AbstractResolver):
+    """
+    Answers from addresses resolved ahead of time, so a reconnect never waits on
+    DNS. refresh() re-resolves in the background; on failure the previous
+    addresses are kept.
+    """
+    def __init__(self):
+        self._resolver: Union[ThreadedResolver, None] = None # needs a running loop, created on first use
+        self._cache: Dict[Tuple[str, int, int], List[ResolveResult]] = {}
+
+    def _get_resolver(self) -> ThreadedResolver:
+        if self._resolver is None:
+            self._resolver = ThreadedResolver()
+        return self._resolver
+
+    async def refresh(self, host: str, port: int, family: int = socket.AF_UNSPEC):
+        try:
+            self._cache[(host, port, family)] = await self._get_resolver().resolve(host, port, family)
+        except Exception as e:
+            log.warning(f'Failed to pre-resolve \'{host}\': {e}')
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_UNSPEC) -> List[ResolveResult]:
+        cached = self._cache.get((host, port, family))
+        if cached is not None:
+            return cached
+        results = await self._get_resolver().resolve(host, port, family)
+        self._cache[(host, port, family)] = results
+        return results
+
+    async def close(self):
+        if self._resolver is not None:
+            await self._resolver.close()
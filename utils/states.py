@@ -1,12 +1,13 @@
+import time
 import logging
 import asyncio
-import datetime
-from typing import TYPE_CHECKING, List, Union
+from typing import TYPE_CHECKING, Iterable, List, Union
 
 from utils.config import config
 
 if TYPE_CHECKING:
     from objects.event import Event
+    from objects.link import ServerLink
 
 log = logging.getLogger(__name__)
 
@@ -15,30 +16,72 @@ class States:
     def __init__(self):
         self._lock = asyncio.Lock()
 
-        self.is_connected: bool = False
-        self.last_heartbeat: datetime.datetime = datetime.datetime(1900,1,1,0,0,0,0)
-        self.is_armed: bool = False
+        self.is_connected: bool = False # any server link healthy
+        self.is_armed: bool = False # any healthy server link armed
         self.last_event_id: Union[str, None] = None
 
+        # Union of the clients every healthy server link sees
         self.client_list_pc: list = []
         self.client_list_ha: list = []
         self.client_list_html: list = []
+        self.seen_event_ids: dict = {} # event id -> time.monotonic() first seen, shared by every server link
 
         self.event_list: List['Event'] = []
+        self.event_retention: float = config.warn_overlay_duration # longest dedupe window, see build_dispatch_table
         self.current_event: str = ''
 
+    def apply_client_list(self, client_map: dict, client_list: list, removed_client_ids: list = None, is_delta: bool = False):
+        '''Updates one server link's client map from its get_result'''
+        if not is_delta:
+            client_map.clear()
+
+        for client_id in removed_client_ids or []:
+            client_map.pop(client_id, None)
+
+        for client in client_list:
+            client_map[client.get('id', client.get('name'))] = client
+
+    def merge_links(self, links: Iterable['ServerLink']):
+        '''Rebuilds the global client lists and armed state from the given server links'''
+        clients = {}
+        is_armed = False
+        for link in links:
+            is_armed = is_armed or link.is_armed
+            for client in link.client_map.values():
+                # A client connected to several servers is counted once
+                clients[(client['type'], client.get('name', client.get('id')))] = client
+
+        new_client_list_pc = []
+        new_client_list_ha = []
+        new_client_list_html = []
+
+        for client in clients.values():
+            if client['type'] == 'pc':
+                new_client_list_pc.append(client)
+            elif client['type'] == 'ha':
+                new_client_list_ha.append(client)
+            elif client['type'] == 'html':
+                new_client_list_html.append(client)
+
+        self.is_armed = is_armed
+        self.client_list_pc = new_client_list_pc
+        self.client_list_ha = new_client_list_ha
+        self.client_list_html = new_client_list_html
+
     async def push_event(self, event: 'Event'):
         async with self._lock:
             self.event_list.append(event)
 
-    async def is_previous_event_valid(self, event_type: str, event_name: str = None):
+    async def is_previous_event_valid(self, event_type: str, event_name: str = None, window: float = None):
+        if window is None:
+            window = config.warn_overlay_duration
         async with self._lock:
-            time_now = datetime.datetime.now()
+            time_now = time.monotonic()
 
             for event in self.event_list:
-                time_diff = time_now - event.timestamp
+                time_diff = time_now - event.monotonic_timestamp
 
-                if time_diff.total_seconds() < config.warn_overlay_duration and event.type == event_type:
+                if time_diff < window and event.type == event_type:
                     if event_name is None or event.event == event_name:
                         return True
 
@@ -46,21 +89,35 @@ class States:
 
     async def is_event_duplicate(self, event_id: str):
         async with self._lock:
-            for event in self.event_list:
-                if event.id == event_id:
-                    return True
-            return False
+            return event_id in self.seen_event_ids
+
+    async def mark_event_seen(self, event_id: str) -> bool:
+        '''Returns False if the event was already seen (on any server link)'''
+        async with self._lock:
+            if event_id in self.seen_event_ids:
+                return False
+            self.seen_event_ids[event_id] = time.monotonic()
+            return True
 
     async def clear_old_events(self):
         async with self._lock:
-            time_now = datetime.datetime.now()
+            time_now = time.monotonic()
 
             def is_valid_event(event: 'Event'):
-                time_diff = time_now - event.timestamp
-                return time_diff.total_seconds() < config.warn_overlay_duration
+                time_diff = time_now - event.monotonic_timestamp
+                return time_diff < self.event_retention
 
             self.event_list = list(filter(is_valid_event, self.event_list))
 
+            # Dict keeps insertion order, so expired IDs are all at the front
+            expired_ids = []
+            for event_id, seen_at in self.seen_event_ids.items():
+                if time_now - seen_at < config.event_dedupe_window:
+                    break
+                expired_ids.append(event_id)
+            for event_id in expired_ids:
+                del self.seen_event_ids[event_id]
+
     async def clear_old_events_worker(self):
         log.info('Starting old events cleaner worker...')
         while True:
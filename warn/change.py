@@ -0,0 +1,98 @@
+import logging
+import threading
+from typing import Tuple, Union
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QSize
+from PySide6.QtGui import QImage, QImageReader
+
+from utils.config import config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+
+def make_thumbnail(image_bytes: bytes) -> Union['np.ndarray', None]:
+    '''Decodes straight to a tiny grayscale thumbnail (JPEG is DCT-downscaled while decoding)'''
+    buffer = QBuffer()
+    buffer.setData(QByteArray(image_bytes))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setScaledSize(QSize(config.frame_change_thumbnail_width, config.frame_change_thumbnail_height))
+    image = reader.read()
+    if image.isNull():
+        return None
+
+    image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+    pixels = np.frombuffer(image.constBits(), dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    return pixels[:, :image.width()].astype(np.int16)
+
+
+class FrameChangeDetector:
+    """
+    Drops camera frames that look the same as the last one shown for that camera.
+
+    Frames are compared as tiny grayscale thumbnails. The motion score is the
+    percentage of thumbnail pixels whose gray level moved by more than
+    `pixelDelta`; frames scoring under `threshold` never reach the overlay
+    process. reset() forgets every camera, so a new overlay always gets its
+    first frames; the drops come from the refreshes while it stays up
+    (`cameraRefreshInterval`). check() is thread safe and meant to run off the
+    event loop.
+    """
+    def __init__(self):
+        self.is_enabled: bool = config.frame_change_enabled and np is not None
+        if config.frame_change_enabled and np is None:
+            log.warning('Frame change detection is enabled but numpy is not installed. Sending every frame.')
+
+        self._lock = threading.Lock()
+        self._last = {} # camera -> (image_bytes, thumbnail)
+        self.scores = {} # camera -> last motion score
+        self.passed = 0
+        self.dropped = 0
+
+    def reset(self):
+        with self._lock:
+            self._last.clear()
+
+    def check(self, camera: str, image_bytes: bytes) -> Tuple[bool, Union[float, None]]:
+        '''(should the frame be shown, motion score in percent or None if there is nothing to compare against)'''
+        if not self.is_enabled:
+            return True, None
+
+        with self._lock:
+            last = self._last.get(camera)
+
+        if last is not None and last[0] == image_bytes:
+            score = 0.0
+            thumbnail = last[1]
+        else:
+            thumbnail = make_thumbnail(image_bytes)
+            if thumbnail is None:
+                return True, None # Let the overlay report the broken frame
+            if last is None or last[1] is None or last[1].shape != thumbnail.shape:
+                score = None
+            else:
+                score = float(np.count_nonzero(np.abs(thumbnail - last[1]) > config.frame_change_pixel_delta)) * 100 / thumbnail.size
+
+        is_changed = score is None or score >= config.frame_change_threshold
+        with self._lock:
+            if is_changed:
+                self._last[camera] = (image_bytes, thumbnail)
+                self.passed += 1
+            else:
+                self.dropped += 1
+            if score is not None:
+                self.scores[camera] = score
+
+        if score is not None:
+            log.debug(f'Camera \'{camera}\' motion score {score:.1f}%{"" if is_changed else " (unchanged, dropped)"}',
+                      extra={'rate_key': f'frame_change_{camera}'})
+        return is_changed, score
+
+    def get_counters(self) -> dict:
+        with self._lock:
+            return {'passed': self.passed, 'dropped': self.dropped, 'scores': dict(self.scores)}
@@ -1,13 +1,16 @@
 import sys
+import math
 import ctypes
 import logging
 from multiprocessing import Queue
+from typing import Union
 
 from PySide6.QtWidgets import QApplication, QWidget
-from PySide6.QtCore import Qt, QRect, QByteArray, QTimer
+from PySide6.QtCore import Qt, QRect, QSize, QByteArray, QTimer
 from PySide6.QtGui import QPainter, QColor, QFont, QPixmap
 
 from utils.config import config
+from utils.logger import setup_logging
 
 log = logging.getLogger(__name__)
 
@@ -18,6 +21,12 @@ class OverlayWindow(QWidget):
 
         self.overlay_title = overlay_title
         self.overlay_message = overlay_message
+        self.tile_count = 0
+
+        # Fonts are built once; the composited frame is rebuilt only on content changes
+        self.title_font = QFont(config.font_family, config.font_title_size, QFont.Weight.Bold)
+        self.message_font = QFont(config.font_family, config.font_message_size, QFont.Weight.Bold)
+        self._frame: Union[QPixmap, None] = None
 
         # Calculate coordinates for display's bottom right
         try:
@@ -51,13 +60,19 @@ class OverlayWindow(QWidget):
     def _create_dummy_image(self):
         '''Create a dummy red placeholder image'''
         log.debug('Creating dummy red placeholder image')
-        dummy_image = QPixmap(1280, 720) # dummy 16:9 image
-        dummy_image.fill(QColor(255, 30, 30))
-        self.image = dummy_image.scaled(
+        # A flat fill scales to a flat fill: size a 16:9 box directly instead of
+        # filling 1280x720 and smooth-scaling it down.
+        size = QSize(1280, 720).scaled(
             config.window_width, config.window_height,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
+            Qt.AspectRatioMode.KeepAspectRatio
         )
+        self.image = QPixmap(size)
+        self.image.fill(QColor(255, 30, 30))
+
+    def update_title(self, overlay_title: str):
+        '''Update the overlay title in place (coalesced repeats)'''
+        self.overlay_title = overlay_title
+        self._invalidate()
 
     def update_image(self, image_bytes):
         '''Update the overlay image with new image data'''
@@ -75,7 +90,7 @@ class OverlayWindow(QWidget):
 
                 self.image = new_image
                 self.overlay_message = None
-                self.update()  # Trigger repaint
+                self._invalidate()
                 log.debug('Image updated successfully')
             else:
                 log.error('Failed to load image from bytes')
@@ -83,8 +98,63 @@ class OverlayWindow(QWidget):
         except Exception as e:
             log.error(f'Error updating image: {e}')
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    def update_tile(self, index: int, count: int, image_bytes):
+        '''Draw one camera frame into its cell of a tiled image'''
+        if count <= 1:
+            self.update_image(image_bytes)
+            return
+
+        tile = QPixmap()
+        if not tile.loadFromData(QByteArray(image_bytes)):
+            log.error(f'Failed to load tile {index} from bytes')
+            return
+
+        if self.tile_count != count:
+            # New layout: start from an empty canvas the size of the image area
+            canvas = QPixmap(self.image.size())
+            canvas.fill(config.background_color)
+            self.image = canvas
+            self.tile_count = count
+
+        cols = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / cols)
+        cell_width = self.image.width() // cols
+        cell_height = self.image.height() // rows
+        cell_x = (index % cols) * cell_width
+        cell_y = (index // cols) * cell_height
+
+        tile = tile.scaled(
+            cell_width, cell_height,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+
+        painter = QPainter(self.image)
+        painter.fillRect(cell_x, cell_y, cell_width, cell_height, config.background_color)
+        painter.drawPixmap(
+            cell_x + (cell_width - tile.width()) // 2,
+            cell_y + (cell_height - tile.height()) // 2,
+            tile
+        )
+        painter.end()
+
+        self.overlay_message = None
+        self._invalidate()
+        log.debug(f'Tile {index + 1}/{count} updated successfully')
+
+    def _invalidate(self):
+        '''Drop the composited frame; it is rebuilt on the next paint'''
+        self._frame = None
+        self.update()  # Trigger repaint
+
+    def _compose_frame(self) -> QPixmap:
+        '''Composite image, message, background and title into one window-sized pixmap'''
+        dpr = self.devicePixelRatioF()
+        frame = QPixmap(self.size() * dpr)
+        frame.setDevicePixelRatio(dpr)
+        frame.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(frame)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
 
         try:
@@ -95,7 +165,7 @@ class OverlayWindow(QWidget):
             # 2. Check if there is a message to draw in the image area
             if self.overlay_message:
                 painter.setPen(config.font_message_color)
-                painter.setFont(QFont(config.font_family, config.font_message_size, QFont.Weight.Bold))
+                painter.setFont(self.message_font)
 
                 image_rect = QRect(0, 0, config.window_width, self.image.height())
 
@@ -115,7 +185,7 @@ class OverlayWindow(QWidget):
 
             # 4. Draw Text using drawText (much simpler!)
             painter.setPen(config.font_title_color)  # Set text color
-            painter.setFont(QFont(config.font_family, config.font_title_size, QFont.Weight.Bold))
+            painter.setFont(self.title_font)
 
             # Create text rectangle with some padding from bottom
             text_padding = 5
@@ -134,27 +204,54 @@ class OverlayWindow(QWidget):
             )
 
         except Exception as e:
-            log.critical(f'Error in paintEvent: {e}')
+            log.critical(f'Error composing overlay frame: {e}')
             # Draw fallback content
             painter.fillRect(self.rect(), QColor(255, 0, 0))
             painter.setPen(QColor(255, 255, 255))
             painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, 'ERROR')
 
-def check_queue_and_update(window: OverlayWindow, image_queue: Queue):
+        painter.end()
+        return frame
+
+    def resizeEvent(self, event):
+        self._frame = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        # Only the title, message or image change what is on screen, so every
+        # other repaint is a single blit of the cached frame.
+        if self._frame is None:
+            self._frame = self._compose_frame()
+
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._frame)
+        painter.end()
+
+def check_queue_and_update(window: OverlayWindow, image_queue: Queue, lifetime_timer: QTimer):
     """
-    Check the queue for new image data and update the window.
+    Check the queue for new image data or title updates and update the window.
     """
     try:
         # get_nowait() checks for an item without blocking
         # This is important for not freezing the UI
-        image_bytes = image_queue.get_nowait()
-        window.update_image(image_bytes)
-        log.debug('Received image from queue and updated window')
+        kind, payload = image_queue.get_nowait()
     except Exception:
         # Queue is empty, just continue
-        pass
+        return
 
-def run_qt(overlay_title: str, image_queue: Queue, overlay_message: str= None):
+    if kind == 'image':
+        window.update_image(payload)
+        log.debug('Received image from queue and updated window')
+    elif kind == 'tile':
+        window.update_tile(*payload)
+        log.debug('Received tile from queue and updated window')
+    elif kind == 'title':
+        window.update_title(payload)
+        lifetime_timer.start(config.warn_overlay_duration * 1000) # Repeated warning keeps the overlay up
+        log.debug('Received title from queue and updated window')
+
+def run_qt(overlay_title: str, image_queue: Queue, log_queue: Queue, overlay_message: str= None):
+    setup_logging(log_queue)
     log.debug('Starting Qt up...')
 
     app = QApplication()
@@ -162,15 +259,17 @@ def run_qt(overlay_title: str, image_queue: Queue, overlay_message: str= None):
     window = OverlayWindow(overlay_title, overlay_message)
     window.show()
 
+    # Set a total lifetime for the window
+    lifetime_timer = QTimer()
+    lifetime_timer.setSingleShot(True)
+    lifetime_timer.timeout.connect(app.quit)
+    lifetime_timer.start(config.warn_overlay_duration * 1000)
+
     # Create a QTimer to periodically check the queue for new images
     timer = QTimer()
-    timer.timeout.connect(lambda: check_queue_and_update(window, image_queue))
+    timer.timeout.connect(lambda: check_queue_and_update(window, image_queue, lifetime_timer))
     timer.start(100)  # Check every 100ms
 
-    # Set a total lifetime for the window
-    lifetime_timer = QTimer()
-    lifetime_timer.singleShot(config.warn_overlay_duration * 1000, app.quit)
-
     app.exec()
 
     sys.exit()
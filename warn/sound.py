@@ -5,6 +5,7 @@ import logging
 from ctypes import create_unicode_buffer, windll, wintypes
 
 from utils.config import WARN_SOUND_LOOP
+from utils.logger import setup_logging
 
 log = logging.getLogger(__name__)
 
@@ -55,7 +56,8 @@ def playsound(sound, block = True):
             # If it fails, there's nothing more that can be done...
             pass
 
-def run_audio():
+def run_audio(log_queue):
+    setup_logging(log_queue)
     log.debug("Starting Audio up...")
 
     for i in range(WARN_SOUND_LOOP):
@@ -0,0 +1,68 @@
+import time
+import logging
+
+from utils.config import config
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    __slots__ = ('capacity', 'refill_seconds', 'tokens', 'updated_at')
+
+    def __init__(self, capacity: int, refill_seconds: float):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        time_now = time.monotonic()
+        if self.refill_seconds > 0:
+            self.tokens = min(self.capacity, self.tokens + (time_now - self.updated_at) / self.refill_seconds)
+        self.updated_at = time_now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class StormController:
+    """
+    Token bucket per warning key (`{source}_{type}_{event}`).
+
+    Every fresh warning (one that spawns overlay/audio) costs a token, except a
+    priority warning taking over from another key. Keys that run out are
+    suppressed until their bucket refills.
+    """
+    def __init__(self):
+        self.buckets = {}
+        self.suppressed = {} # key -> count
+        self.coalesced = {} # key -> count
+
+    def allow(self, key: str) -> bool:
+        if not config.storm_control_enabled:
+            return True
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(config.storm_control_burst, config.storm_control_refill_seconds)
+            self.buckets[key] = bucket
+
+        if bucket.take():
+            return True
+
+        self.suppressed[key] = self.suppressed.get(key, 0) + 1
+        log.warning(f'Warning storm on \'{key}\'. Suppressed {self.suppressed[key]} so far.',
+                    extra={'rate_key': f'storm_{key}'})
+        return False
+
+    def record_coalesced(self, key: str) -> int:
+        self.coalesced[key] = self.coalesced.get(key, 0) + 1
+        return self.coalesced[key]
+
+    def get_counters(self) -> dict:
+        return {
+            'suppressed': dict(self.suppressed),
+            'coalesced': dict(self.coalesced),
+        }
@@ -1,8 +1,11 @@
 import logging
 from multiprocessing import Process, Queue
-import datetime
+import time
 
 from utils.config import config
+from utils.logger import get_log_queue
+from warn.storm import StormController
+from warn.change import FrameChangeDetector
 from warn.overlay import run_qt
 from warn.sound import run_audio
 
@@ -11,7 +14,12 @@ log = logging.getLogger(__name__)
 class WarnSession:
     def __init__(self):
         self.current_event_text = None
-        self.last_warned = datetime.datetime(1900,1,1,0,0,0,0)
+        self.current_overlay_text = None
+        self.current_repeat_count = 0
+        self.last_started_text = None # never cleared, unlike current_event_text
+        self.last_warned = float('-inf') # time.monotonic()
+        self.storm = StormController()
+        self.frames = FrameChangeDetector()
 
         self.qt_process = None
         self.is_qt_running = False
@@ -24,30 +32,44 @@ class WarnSession:
               overlay_text: str,
               overlay_message: str = None,
               no_audio: bool = False,
-              is_priority: bool = False):
+              is_priority: bool = False) -> bool:
+        '''Returns whether this warning is on screen afterwards (started or coalesced)'''
+
+        # Repeats of the warning on screen are folded into it instead of respawning it
+        if self.repeat(event_text):
+            return True
+
+        # Priority warnings (motion, kill) preempt anything else for free, but one
+        # restarting itself (a flapping sensor) pays a token like any other warning
+        is_restart = event_text == self.last_started_text
+        if (is_restart or not is_priority) and not self.storm.allow(event_text):
+            return False
 
         if is_priority:
             log.info(f'Priority warning \'{event_text}\' received.')
             self._stop()
         else:
-            time_now = datetime.datetime.now()
-            time_diff = time_now - self.last_warned
-            if time_diff.total_seconds() < config.warn_overlay_duration:
-                log.info(f'Ongoing warning \'{self.current_event_text}\' exists. Ignoring \'{event_text}\'')
-                return
+            time_diff = time.monotonic() - self.last_warned
+            if time_diff < config.warn_overlay_duration:
+                log.info(f'Ongoing warning \'{self.current_event_text}\' exists. Ignoring \'{event_text}\'',
+                         extra={'rate_key': 'warn_ignored'})
+                return False
 
         log.debug('Starting Warning Sequence...')
         self.current_event_text = event_text
-        self.last_warned = datetime.datetime.now()
+        self.last_started_text = event_text
+        self.current_overlay_text = overlay_text
+        self.current_repeat_count = 1
+        self.last_warned = time.monotonic()
 
         if not no_audio:
             self._start_audio()
         self._start_qt(overlay_text, overlay_message)
+        return True
 
     def stop(self, event_text: str):
-        time_now = datetime.datetime.now()
-        time_diff = time_now - self.last_warned
-        if time_diff.total_seconds() > config.warn_overlay_duration:
+        time_diff = time.monotonic() - self.last_warned
+        if time_diff > config.warn_overlay_duration:
             self.current_event_text = None
         if event_text == '_force_stop_all' or event_text == self.current_event_text:
             self._stop()
@@ -56,7 +78,38 @@ class WarnSession:
         return
 
     def update_image(self, image_bytes: bytes = None):
-        self.image_queue.put(image_bytes)
+        self.image_queue.put(('image', image_bytes))
+
+    def update_tile(self, index: int, count: int, image_bytes: bytes):
+        self.image_queue.put(('tile', (index, count, image_bytes)))
+
+    def update_title(self, overlay_text: str):
+        self.image_queue.put(('title', overlay_text))
+
+    def repeat(self, event_text: str) -> bool:
+        '''Updates the overlay in place if it shows this warning. Returns whether it did.'''
+        if not self.is_showing(event_text):
+            return False
+        self._coalesce()
+        return True
+
+    def is_showing(self, event_text: str) -> bool:
+        '''Whether the overlay on screen belongs to this warning'''
+        return event_text == self.current_event_text and self._is_live()
+
+    def _is_live(self) -> bool:
+        time_diff = time.monotonic() - self.last_warned
+        return (self.qt_process is not None and
+                self.qt_process.is_alive() and
+                time_diff < config.warn_overlay_duration)
+
+    def _coalesce(self):
+        self.current_repeat_count += 1
+        self.storm.record_coalesced(self.current_event_text)
+        self.last_warned = time.monotonic()
+        log.info(f'Repeated warning \'{self.current_event_text}\' x{self.current_repeat_count}. Updating overlay in place.',
+                 extra={'rate_key': f'warn_coalesced_{self.current_event_text}'})
+        self.update_title(f'{self.current_overlay_text} x{self.current_repeat_count}')
 
     def _stop(self):
         log.debug('Stopping Warning Sequence...')
@@ -70,8 +123,16 @@ class WarnSession:
             log.debug('Qt already running. Killing...')
             self._stop_qt()
 
+        # Fresh queue per overlay: updates still queued (or in the feeder thread)
+        # for an earlier overlay can never show up on this one
+        self.image_queue.cancel_join_thread()
+        self.image_queue.close()
+        self.image_queue = Queue()
+        # The new overlay has no frames yet, so nothing counts as unchanged
+        self.frames.reset()
+
         # Create a new process targeting run_qt
-        self.qt_process = Process(target=run_qt, args=(overlay_text, self.image_queue, overlay_message))
+        self.qt_process = Process(target=run_qt, args=(overlay_text, self.image_queue, get_log_queue(), overlay_message))
         self.qt_process.daemon = False
 
         self.qt_process.start()
@@ -98,7 +159,7 @@ class WarnSession:
             self._stop_audio()
 
         # Create a new process targeting run_audio
-        self.audio_process = Process(target=run_audio)
+        self.audio_process = Process(target=run_audio, args=(get_log_queue(), ))
         self.audio_process.daemon = False
 
         self.audio_process.start()